@@ -1,3 +1,18 @@
+import array as array_module
+import collections
+import heapq
+import os
+import tempfile
+
+import instrumentation
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+@instrumentation.timed('longest_oscillation')
 def longest_oscillation(array):
     '''
     This function takes an array of integers as input and returns the indexes of longest oscillation
@@ -7,7 +22,9 @@ def longest_oscillation(array):
     if L[aj] < L[aj+1], then L[aj+1] > L[aj+2]
     if L[aj] > L[aj+1], then L[aj+1] < L[aj+2]
 
-    The function uses a DP approach with memoization in 2 lists of n length.
+    The function uses a DP approach which keeps the length and last index of the best oscillation ending on a rise
+    and on a fall, and a backpointer array recording the index each appended element follows. The indexes are
+    rebuilt from the backpointers at the end.
 
     Complexity: O(n) where n is the length of the input array
     Space complexity: O(n) where n is the size of the input list
@@ -20,81 +37,394 @@ def longest_oscillation(array):
     if len(array) == 0:
         return (0, [])
 
-    # 2 lists for keeping track of the index that oscillate positively or oscillate negatively
-    memo_positive = [0]
-    memo_negative = [0]
+    # the length and last index of the oscillations ending positively and negatively
+    positive_length, positive_last = 1, 0
+    negative_length, negative_last = 1, 0
+    # the index before each index in the oscillation it was appended to
+    backpointer = array_module.array('i', [-1]) * len(array)
     for x in range(1, len(array)):
         # if the current element is greater than the one before it it is oscillating positively
         # meaning the element before must be oscillating negatively.
         if array[x] > array[x-1]:
-            memo_positive = memo_negative + [x]
+            backpointer[x] = negative_last
+            positive_length, positive_last = negative_length + 1, x
 
         # if the current element is less than the one before it it is oscillating negatively
         # meaning the element before must be oscillating positively.
         elif array[x] < array[x-1]:
-            memo_negative = memo_positive + [x]
+            backpointer[x] = positive_last
+            negative_length, negative_last = positive_length + 1, x
 
-    # return the list with the greatest oscillation
-    if len(memo_negative) >= len(memo_positive):
-        return len(memo_negative), memo_negative
+    # rebuild the list with the greatest oscillation
+    if negative_length >= positive_length:
+        length, index = negative_length, negative_last
     else:
-        return len(memo_positive), memo_positive
+        length, index = positive_length, positive_last
+    indexes = []
+    while index >= 0:
+        indexes.append(index)
+        index = backpointer[index]
+    indexes.reverse()
+    return length, indexes
+
+
+def longest_oscillation_stream(values):
+    '''
+    This function is the online form of longest_oscillation. It consumes an iterator of values, such as a live feed,
+    and after each value yields the length of the longest oscillation seen so far, keeping only the previous value
+    and two lengths.
+
+    Complexity: O(1) time and space per value
+    :param values: An iterable of integers
+    :return: A generator of the longest oscillation length after each value
+    '''
+    positive_length = negative_length = 0
+    previous = None
+    for value in values:
+        if previous is None:
+            positive_length = negative_length = 1
+        elif value > previous:
+            positive_length = negative_length + 1
+        elif value < previous:
+            negative_length = positive_length + 1
+        previous = value
+        yield max(positive_length, negative_length)
+
 
 
+# the eight moves from a position in a 2d matrix
+MOVES = [(-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (1, -1), (-1, 1), (1, 1)]
 
+
+@instrumentation.timed('longest_walk')
 def longest_walk(M):
     '''
     This function takes an N*M matrix as input and returns the longest increasing path in
-    that matrix using a DP approach based on the DFS algorithm
+    that matrix using an iterative DP approach. The cells are processed in rounds in ascending order of the
+    increasing path DAG: a cell joins the round after its last smaller neighbour has been processed, so every
+    cell in round k has a longest path of exactly k ending at it and a neighbour from round k-1 as its
+    predecessor. Each round is one vectorized batch over the 8 moves when NumPy is available. The path is
+    rebuilt from the predecessor array, and no recursion is used.
     Complexity: O(N*M) where N and M are the dimensions of the input matrix.
     Space complexity: O(M*N) where N and M are the dimensions of the input matrix.
-    :param M: An N*M matrix represented as a list of lists
+    :param M: An N*M matrix represented as a list of lists or a 2d NumPy array
     :return: a tuple containing the length of the longest path and the indexes corresponding to the moves
     '''
     # if the matrix is empty return
-    if len(M) == 0:
+    if len(M) == 0 or len(M[0]) == 0:
         return (0, [])
 
-    # Get the dimensions of the input matrix
+    if np is not None:
+        maxVal, index, predecessor = _longest_walk_rounds_numpy(np.asarray(M))
+    else:
+        maxVal, index, predecessor = _longest_walk_rounds(M)
+    if instrumentation.active is not None:
+        instrumentation.active.add('longest_walk.rounds', maxVal)
+
+    # walk the predecessors back from the end of the path
+    n = len(M[0])
+    solution = []
+    while index >= 0:
+        solution.append(coordinates(index, n))
+        index = int(predecessor[index])
+    # reverse the solution to display it in ascending order
+    solution.reverse()
+    # return
+    return maxVal, solution
+
+
+def _longest_walk_rounds_numpy(values, small_frontier=64):
+    '''
+    The NumPy engine of longest_walk. Each cell gets a bit mask of the moves leading to a larger neighbour so a round
+    only gathers masks and counters for its frontier. Rounds with fewer than small_frontier cells, as on long thin
+    paths, are run through memoryviews of the same arrays to avoid the fixed cost of the vectorized calls.
+    :param values: A 2d NumPy array
+    :param small_frontier: The frontier size below which a round is not vectorized
+    :return: A tuple of the longest path length, the flat index of a cell it ends at and the flat predecessor array
+    '''
+    m, n = values.shape
+    index_type = np.int32 if m * n < 2 ** 31 else np.int64
+    # count the smaller neighbours of every cell and mark the moves to larger ones, one shifted comparison per move
+    remaining = np.zeros((m, n), dtype=np.int8)
+    larger = np.zeros((m, n), dtype=np.uint8)
+    for d, (dx, dy) in enumerate(MOVES):
+        here = (slice(max(-dx, 0), m + min(-dx, 0)), slice(max(-dy, 0), n + min(-dy, 0)))
+        there = (slice(max(dx, 0), m + min(dx, 0)), slice(max(dy, 0), n + min(dy, 0)))
+        remaining[here] += values[there] < values[here]
+        larger[here] |= (values[there] > values[here]).astype(np.uint8) << d
+    remaining = remaining.ravel()
+    larger = larger.ravel()
+    if instrumentation.active is not None:
+        _count_memo(m * n, int(remaining.sum()))
+    predecessor = np.full(m * n, -1, dtype=index_type)
+    steps = [dx * n + dy for dx, dy in MOVES]
+    remaining_view = memoryview(remaining)
+    larger_view = memoryview(larger)
+    predecessor_view = memoryview(predecessor)
+
+    frontier = np.flatnonzero(remaining == 0).astype(index_type)
+    rounds = 0
+    while len(frontier) > 0:
+        rounds += 1
+        last = frontier
+        if len(frontier) < small_frontier:
+            batch = []
+            for source in frontier.tolist():
+                code = larger_view[source]
+                for d in range(8):
+                    if code >> d & 1:
+                        target = source + steps[d]
+                        remaining_view[target] -= 1
+                        if remaining_view[target] == 0:
+                            predecessor_view[target] = source
+                            batch.append(target)
+            frontier = np.array(batch, dtype=index_type)
+            continue
+        codes = larger[frontier]
+        batches = []
+        for d in range(8):
+            source = frontier[(codes >> d & 1).astype(bool)]
+            target = source + steps[d]
+            # a cell is reached at most once per move so the decrement has no repeated indexes
+            left = remaining[target] - 1
+            remaining[target] = left
+            ready = left == 0
+            predecessor[target[ready]] = source[ready]
+            batches.append(target[ready])
+        # keep the frontier in memory order so the gathers of the next round stay local
+        frontier = np.sort(np.concatenate(batches))
+    return rounds, int(last.min()), predecessor
+
+
+def _count_memo(cells, edges):
+    '''
+    Records the memo counters of a longest_walk engine. Every cell has its length computed once, a memo miss, and
+    every edge of the increasing path DAG reuses the final length of its smaller end, a memo hit
+    '''
+    instrumentation.active.add('longest_walk.memo_misses', cells)
+    instrumentation.active.add('longest_walk.memo_hits', edges)
+
+
+def _longest_walk_rounds(M):
+    '''
+    The pure Python engine of longest_walk used without NumPy
+    :param M: An N*M matrix represented as a list of lists
+    :return: A tuple of the longest path length, the flat index of a cell it ends at and the flat predecessor array
+    '''
     m, n = len(M), len(M[0])
+    remaining = array_module.array('b', bytes(m * n))
+    for x in range(m):
+        for y in range(n):
+            for dx, dy in MOVES:
+                if 0 <= x + dx < m and 0 <= y + dy < n and M[x + dx][y + dy] < M[x][y]:
+                    remaining[n * x + y] += 1
+    predecessor = array_module.array('q', [-1]) * (m * n)
+    if instrumentation.active is not None:
+        _count_memo(m * n, sum(remaining))
 
-    # Use an n*m matrix to keep track of all increasing paths
-    memo = [[0]*m for _ in range(n)]
+    frontier = [index for index in range(m * n) if remaining[index] == 0]
+    rounds = 0
+    while len(frontier) > 0:
+        rounds += 1
+        last = frontier
+        frontier = []
+        for index in last:
+            x, y = coordinates(index, n)
+            for dx, dy in MOVES:
+                if 0 <= x + dx < m and 0 <= y + dy < n and M[x + dx][y + dy] > M[x][y]:
+                    target = n * (x + dx) + y + dy
+                    remaining[target] -= 1
+                    if remaining[target] == 0:
+                        predecessor[target] = index
+                        frontier.append(target)
+    return rounds, min(last), predecessor
 
-    # generate a list of length MN containing the maximum increasing path to the corresponding index
-    Result = [longest_walk_aux(x, y, M, memo) for x in range(m) for y in range(n)]
 
-    # an list to hold the solution
-    solution = []
-    maxVal = max(Result)
 
-    # Get the index of the maximum path value
-    index = Result.index(maxVal)
-    # get the matrix coordinates of that element
+@instrumentation.timed('longest_walk_tiled')
+def longest_walk_tiled(M, tile=1024, memo_file=None):
+    '''
+    This function is the out of core form of longest_walk for matrices too large for memory, such as a memory
+    mapped .npy file. The matrix is processed in tile*tile blocks read with a one cell halo. The DP values and the
+    number of smaller neighbours each cell still waits for are kept in memory mapped buffers, so the rounds of
+    longest_walk carry on from block to block: a block settles every cell whose smaller neighbours are settled and
+    passes the values across its border, queueing a neighbouring block again when one of its cells becomes ready.
+    Every cell is settled exactly once and peak memory is O(tile^2).
+    Complexity: O(N*M + K*tile^2 + R) where N and M are the dimensions of the input matrix, K is the number of times
+    a block is visited and R is the number of rounds. Every visit sets the block up with vectorized passes over
+    tile^2 cells, so K*tile^2 dominates when long paths cross many block borders, and every round has a fixed cost
+    of a few dozen NumPy calls, except that rounds of fewer than 64 cells, as on a long thin path, are run as
+    scalar loops costing a few microseconds per cell
+    :param M: A 2d NumPy array or memmap, or the file name of a .npy file which is memory mapped
+    :param tile: The side length of a block
+    :param memo_file: The file the DP values are kept in, by default a temporary file which is removed afterwards
+    :return: a tuple containing the length of the longest path and the indexes corresponding to the moves
+    '''
+    if np is None:
+        raise ImportError('longest_walk_tiled requires numpy')
+    values = np.load(M, mmap_mode='r') if isinstance(M, str) else M
+    if values.shape[0] == 0 or values.shape[1] == 0:
+        return (0, [])
+    m, n = values.shape
+    temporary = memo_file is None
+    if temporary:
+        handle, memo_file = tempfile.mkstemp(suffix='.walk')
+        os.close(handle)
+    handle, waiting_file = tempfile.mkstemp(suffix='.walk')
+    os.close(handle)
+    memo = np.memmap(memo_file, dtype=np.int32, mode='w+', shape=(m, n))
+    waiting = np.memmap(waiting_file, dtype=np.int8, mode='w+', shape=(m, n))
+    try:
+        return _longest_walk_tiles(values, memo, waiting, tile)
+    finally:
+        del memo, waiting
+        os.remove(waiting_file)
+        if temporary:
+            os.remove(memo_file)
+
+
+def _longest_walk_tiles(values, memo, waiting, tile):
+    '''
+    Runs the block rounds of longest_walk_tiled and rebuilds the path from the settled DP values
+    '''
+    m, n = values.shape
+    rows, cols = -(-m // tile), -(-n // tile)
+
+    def bounds(r, c):
+        x0, x1, y0, y1 = r * tile, min((r + 1) * tile, m), c * tile, min((c + 1) * tile, n)
+        # the block with its halo
+        hx0, hx1, hy0, hy1 = max(x0 - 1, 0), min(x1 + 1, m), max(y0 - 1, 0), min(y1 + 1, n)
+        interior = (slice(x0 - hx0, x1 - hx0), slice(y0 - hy0, y1 - hy0))
+        return (slice(hx0, hx1), slice(hy0, hy1)), interior
+
+    # count the smaller neighbours of every cell a block at a time
+    for r in range(rows):
+        for c in range(cols):
+            window, interior = bounds(r, c)
+            block = np.asarray(values[window])
+            count = np.zeros(block.shape, dtype=np.int8)
+            for dx, dy, here, there in _shifts(*block.shape):
+                count[here] += block[there] < block[here]
+            memo[window][interior] = 1
+            waiting[window][interior] = count[interior]
+
+    queue = collections.deque((r, c) for r in range(rows) for c in range(cols))
+    queued = set(queue)
+    while len(queue) > 0:
+        r, c = queue.popleft()
+        queued.discard((r, c))
+        window, interior = bounds(r, c)
+        dp, left, ready = _longest_walk_block(np.asarray(values[window]), np.array(memo[window]),
+                                              np.array(waiting[window]), interior)
+        memo[window] = dp
+        waiting[window] = left
+        # the halo cells which became ready belong to the neighbouring blocks
+        for x, y in zip(*np.nonzero(ready)):
+            neighbour = ((window[0].start + x) // tile, (window[1].start + y) // tile)
+            if neighbour not in queued:
+                queued.add(neighbour)
+                queue.append(neighbour)
+
+    # find the first cell holding the longest path a block at a time
+    maxVal, index = 0, 0
+    for r in range(rows):
+        x0, x1 = r * tile, min((r + 1) * tile, m)
+        band = np.asarray(memo[x0:x1])
+        if band.max() > maxVal:
+            maxVal = int(band.max())
+            index = x0 * n + int(band.argmax())
+
+    # walk back through neighbours whose path is one shorter
     x, y = coordinates(index, n)
-    # append the first coordinate to the solution
-    solution.append((x, y))
-    # this while loop will run at maximum N*M times where the longest path includes all elements
+    solution = [(x, y)]
     while len(solution) < maxVal:
-        # all possible moves from a position in a 2d matrix
-        moves = [(x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1), (x - 1, y - 1), (x + 1, y - 1), (x - 1, y + 1), (x + 1, y + 1)]
-        # filter the valid moves from the current position
-        validMoves = [move for move in moves if 0 <= move[0] < m and 0 <= move[1] < n]
-
-        # iterate through the valid moves checking if the element at that position is 1 less than the current value\
-        # if it is append it to the solution and break
-        for move in validMoves:
-            if Result[n*move[0] + move[1]] == Result[n*x + y] - 1:
-                solution.append(move)
-                x, y = move[0], move[1]
+        for dx, dy in MOVES:
+            # item reads one cell without the indexing overhead of a memmap
+            if 0 <= x + dx < m and 0 <= y + dy < n and values.item(x + dx, y + dy) < values.item(x, y) and \
+                    memo.item(x + dx, y + dy) == memo.item(x, y) - 1:
+                x, y = x + dx, y + dy
+                solution.append((x, y))
                 break
-
-    # reverse the solution to display it in ascending order
     solution.reverse()
-    # return
     return maxVal, solution
 
 
+def _shifts(m, n):
+    '''
+    Yields every move with the pair of slices matching each cell of an m*n block to its neighbour in that direction
+    '''
+    for dx, dy in MOVES:
+        here = (slice(max(-dx, 0), m + min(-dx, 0)), slice(max(-dy, 0), n + min(-dy, 0)))
+        there = (slice(max(dx, 0), m + min(dx, 0)), slice(max(dy, 0), n + min(dy, 0)))
+        yield dx, dy, here, there
+
+
+def _longest_walk_block(values, memo, waiting, interior, small_frontier=64):
+    '''
+    Settles every cell of the interior of a block whose smaller neighbours are all settled, in rounds as in
+    longest_walk, passing the values on to the larger neighbours in the block and its halo. Settled cells are marked
+    with a waiting count of -1. Rounds with fewer than small_frontier cells are run through memoryviews of the same
+    arrays as in _longest_walk_rounds_numpy.
+    :param values: The block and its halo as a 2d NumPy array
+    :param memo: The DP values of the block and its halo
+    :param waiting: The number of smaller neighbours each cell of the block and its halo is waiting for
+    :param interior: A pair of slices selecting the block inside its halo
+    :param small_frontier: The frontier size below which a round is not vectorized
+    :return: The DP values and waiting counts of the block and its halo, and a mask of the halo cells made ready
+    '''
+    m, n = values.shape
+    inside = np.zeros((m, n), dtype=bool)
+    inside[interior] = True
+    larger = np.zeros((m, n), dtype=np.uint8)
+    for d, (dx, dy, here, there) in enumerate(_shifts(m, n)):
+        larger[here] |= ((values[there] > values[here]) & inside[here]).astype(np.uint8) << d
+    shape = (m, n)
+    dp, waiting, inside = memo.ravel(), waiting.ravel(), inside.ravel()
+    larger = larger.ravel()
+    steps = [dx * n + dy for dx, dy in MOVES]
+    released = np.zeros(m * n, dtype=bool)
+    dp_view = memoryview(dp)
+    waiting_view = memoryview(waiting)
+    inside_view = memoryview(inside)
+    larger_view = memoryview(larger)
+    released_view = memoryview(released)
+
+    frontier = np.flatnonzero(inside & (waiting == 0))
+    while len(frontier) > 0:
+        if len(frontier) < small_frontier:
+            batch = []
+            for source in frontier.tolist():
+                waiting_view[source] = -1
+                code = larger_view[source]
+                length = dp_view[source] + 1
+                for d in range(8):
+                    if code >> d & 1:
+                        target = source + steps[d]
+                        if length > dp_view[target]:
+                            dp_view[target] = length
+                        waiting_view[target] -= 1
+                        if waiting_view[target] == 0:
+                            if inside_view[target]:
+                                batch.append(target)
+                            else:
+                                released_view[target] = True
+            frontier = np.array(batch, dtype=np.int64)
+            continue
+        waiting[frontier] = -1
+        codes = larger[frontier]
+        batches = []
+        for d in range(8):
+            source = frontier[(codes >> d & 1).astype(bool)]
+            target = source + steps[d]
+            dp[target] = np.maximum(dp[target], dp[source] + 1)
+            left = waiting[target] - 1
+            waiting[target] = left
+            batches.append(target[left == 0])
+        ready = np.sort(np.concatenate(batches))
+        released[ready[~inside[ready]]] = True
+        frontier = ready[inside[ready]]
+    return dp.reshape(shape), waiting.reshape(shape), released.reshape(shape)
+
 
 def coordinates(index, n):
     '''
@@ -118,7 +448,6 @@ def longest_walk_aux(x, y, M, memo):
     :param memo: The memoization structure represented as a 2d list
     :return: The value of the longest path ending at position x, y
     '''
-
     # if the value has not been previously found and stored in memo
     if memo[y][x] == 0:
         # generate a list of all possible moves
@@ -136,5 +465,127 @@ def longest_walk_aux(x, y, M, memo):
     return memo[y][x]
 
 
+class LongestWalkIndex:
+    '''
+    This class keeps the longest increasing path of a matrix up to date while its cells are edited. It holds the same
+    memo as longest_walk_aux, memo[y][x] being the length of the longest path ending at position x, y, and a bucket
+    of cells for every length so the longest path is always known. After an update only the cells downstream of the
+    edited cell in the increasing path DAG are recomputed, in ascending order of value, and the recomputation stops
+    at cells whose length did not change.
+    '''
+    def __init__(self, M):
+        '''
+        Constructor
+        Complexity: O(N*M*log(N*M)) where N and M are the dimensions of the input matrix
+        :param M: An N*M matrix represented as a list of lists or a 2d NumPy array
+        '''
+        self.M = [list(row) for row in M]
+        self.m = len(self.M)
+        self.n = len(self.M[0]) if self.m > 0 else 0
+        self.memo = [[0 for _ in range(self.m)] for _ in range(self.n)]
+        # the cells holding each path length, and the greatest length with a cell
+        self.buckets = collections.defaultdict(set)
+        self.longest = 0
+        self._recompute((x, y) for x in range(self.m) for y in range(self.n))
+
+    def update(self, x, y, value):
+        '''
+        This function sets the value of a cell and recomputes the paths it changed. The cells which may change are
+        the cell itself and the neighbours which were or are now larger than it, and from them the change spreads to
+        larger neighbours only while lengths keep changing.
+        Complexity: O(A*log(A)) where A is the number of cells whose length is recomputed
+        :param x: The row in the matrix
+        :param y: The column in the matrix
+        :param value: The new value of the cell
+        :return: The number of cells recomputed
+        '''
+        old = self.M[x][y]
+        self.M[x][y] = value
+        if instrumentation.active is not None:
+            instrumentation.active.add('LongestWalkIndex.updates')
+        seeds = [(x, y)] + [(i, j) for i, j in self._neighbours(x, y) if self.M[i][j] > min(old, value)]
+        return self._recompute(seeds)
+
+    def length(self):
+        '''
+        Complexity: O(1) amortised
+        :return: The length of the longest increasing path
+        '''
+        while self.longest > 0 and not self.buckets[self.longest]:
+            self.longest -= 1
+        return self.longest
+
+    def longest_path(self):
+        '''
+        This function rebuilds a longest increasing path by walking back from a cell of the longest bucket through
+        smaller neighbours whose path is one shorter
+        Complexity: O(L) where L is the length of the path
+        :return: a tuple containing the length of the longest path and the indexes corresponding to the moves
+        '''
+        maxVal = self.length()
+        if maxVal == 0:
+            return (0, [])
+        x, y = next(iter(self.buckets[maxVal]))
+        solution = [(x, y)]
+        while self.memo[y][x] > 1:
+            for i, j in self._neighbours(x, y):
+                if self.M[i][j] < self.M[x][y] and self.memo[j][i] == self.memo[y][x] - 1:
+                    x, y = i, j
+                    break
+            solution.append((x, y))
+        # reverse the solution to display it in ascending order
+        solution.reverse()
+        return maxVal, solution
 
+    def _neighbours(self, x, y):
+        '''
+        :return: The positions of the cells one move away from x, y inside the matrix
+        '''
+        return [(x + dx, y + dy) for dx, dy in MOVES if 0 <= x + dx < self.m and 0 <= y + dy < self.n]
 
+    def _recompute(self, cells):
+        '''
+        This function invalidates the given cells and recomputes them and the cells their changes reach. Cells are
+        taken from a heap in ascending order of value, so every smaller neighbour of a cell is final when the cell is
+        recomputed, and no recursion is used.
+        :param cells: An iterable of positions to recompute
+        :return: The number of cells recomputed
+        '''
+        M, memo, buckets = self.M, self.memo, self.buckets
+        # the length each invalidated cell had before, to tell whether its change must spread
+        previous = {}
+        heap = []
+        for x, y in cells:
+            if (x, y) not in previous:
+                previous[(x, y)] = memo[y][x]
+                heap.append((M[x][y], x, y))
+        for x, y in previous:
+            buckets[memo[y][x]].discard((x, y))
+            memo[y][x] = 0
+        heapq.heapify(heap)
+        count = 0
+        hits = 0
+        while len(heap) > 0:
+            currentVal, x, y = heapq.heappop(heap)
+            count += 1
+            neighbours = self._neighbours(x, y)
+            smaller = [memo[j][i] for i, j in neighbours if M[i][j] < currentVal]
+            hits += len(smaller)
+            length = 1 + max(smaller + [0])
+            memo[y][x] = length
+            buckets[length].add((x, y))
+            self.longest = max(self.longest, length)
+            if length == previous.pop((x, y)):
+                continue
+            # the larger neighbours build on this length so they are invalidated in turn
+            for i, j in neighbours:
+                if M[i][j] > currentVal and (i, j) not in previous:
+                    previous[(i, j)] = memo[j][i]
+                    buckets[memo[j][i]].discard((i, j))
+                    memo[j][i] = 0
+                    heapq.heappush(heap, (M[i][j], i, j))
+        if instrumentation.active is not None:
+            # every recomputed cell is a memo miss and every smaller neighbour length it reads is a memo hit
+            instrumentation.active.add('LongestWalkIndex.recomputed', count)
+            instrumentation.active.add('LongestWalkIndex.memo_hits', hits)
+        return count
@@ -1,8 +1,28 @@
+import bisect
+import collections
+import hashlib
 import math
+import mmap
+import multiprocessing
+import os
+import random
+import struct
+import timeit
+from array import array
+from multiprocessing import shared_memory
+
+import instrumentation
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 class PriorityQueue:
     '''
-    This class represents a priority que used within the tasks for the assignment
+    This class represents a priority queue used within the tasks for the assignment. It is implemented as a
+    binary min heap of [vertex, priority, ...] entries together with a position index mapping each vertex to its
+    slot in the heap, which allows decrease-key and pop-min in O(log n)
     '''
     def __init__(self):
         '''
@@ -10,6 +30,13 @@ class PriorityQueue:
         Complexity: O(1)
         '''
         self.queue = []
+        self.position = {}
+
+    def __len__(self):
+        return len(self.queue)
+
+    def __contains__(self, vertex):
+        return vertex in self.position
 
     def isEmpty(self):
         '''
@@ -19,48 +46,201 @@ class PriorityQueue:
         '''
         return len(self.queue) == 0
 
-    def insert(self, data):
+    def contains(self, vertex):
         '''
-        This function inserts a value into the priority queue
+        This function checks if a vertex is currently in the queue
         Complexity: O(1)
-        :param data: The data to be inserted
+        :param vertex: The vertex in question
+        :return: Boolean value representing the vertex being queued or not
+        '''
+        return vertex in self.position
+
+    def insert(self, data):
+        '''
+        This function inserts a value into the priority queue. If the vertex is already queued the entry is
+        replaced when the new priority is smaller, so a vertex is never held twice
+        Complexity: O(log n) where n is the number of elements in the queue
+        :param data: The data to be inserted, a list whose first two elements are the vertex and its priority
         :return: n/a
         '''
+        vertex = data[0]
+        if vertex in self.position:
+            i = self.position[vertex]
+            if data[1] < self.queue[i][1]:
+                self.queue[i] = data
+                self._sift_up(i)
+            return
         self.queue.append(data)
+        self.position[vertex] = len(self.queue) - 1
+        self._sift_up(len(self.queue) - 1)
 
     def update(self, vertex, val):
         '''
         This function is used to update a value in the priority queue
-        Complexity: O(n) where n is the number of elements in the queue
+        Complexity: O(log n) where n is the number of elements in the queue
         :param vertex: The vertex to be updated
         :param val: The value to replace
         :return: n/a
         '''
-        for i in range(len(self.queue)):
-            if self.queue[i][0] == vertex:
-                self.queue[i][1] = val
+        i = self.position.get(vertex)
+        if i is None:
+            return
+        old = self.queue[i][1]
+        self.queue[i][1] = val
+        if val < old:
+            self._sift_up(i)
+        else:
+            self._sift_down(i)
 
     def pop(self):
         '''
         This function pops the smallest value from the priority queue
-        Complexity: O(n) where n is the length of the priority queue
-        :return:
+        Complexity: O(log n) where n is the length of the priority queue
+        :return: The entry with the smallest priority, or -1 if the queue is empty
         '''
-        minVal = 0
         if len(self.queue) == 0:
             return -1
+        item = self.queue[0]
+        last = self.queue.pop()
+        del self.position[item[0]]
+        if len(self.queue) > 0:
+            self.queue[0] = last
+            self.position[last[0]] = 0
+            self._sift_down(0)
+        return item
+
+    def _sift_up(self, i):
+        '''
+        Moves the entry at slot i towards the root until the heap property holds
+        Complexity: O(log n) where n is the length of the priority queue
+        '''
+        queue = self.queue
+        position = self.position
+        item = queue[i]
+        while i > 0:
+            parent = (i - 1) >> 1
+            if queue[parent][1] <= item[1]:
+                break
+            queue[i] = queue[parent]
+            position[queue[i][0]] = i
+            i = parent
+        queue[i] = item
+        position[item[0]] = i
+
+    def _sift_down(self, i):
+        '''
+        Moves the entry at slot i towards the leaves until the heap property holds
+        Complexity: O(log n) where n is the length of the priority queue
+        '''
+        queue = self.queue
+        position = self.position
+        n = len(queue)
+        item = queue[i]
+        while True:
+            child = 2 * i + 1
+            if child >= n:
+                break
+            if child + 1 < n and queue[child + 1][1] < queue[child][1]:
+                child += 1
+            if item[1] <= queue[child][1]:
+                break
+            queue[i] = queue[child]
+            position[queue[i][0]] = i
+            i = child
+        queue[i] = item
+        position[item[0]] = i
+
+
+class CountingPriorityQueue(PriorityQueue):
+    '''
+    A PriorityQueue which counts its pops, inserts and decrease-key updates into a Recorder. It is used in place of
+    PriorityQueue while instrumentation is recording so the plain queue carries no counting cost
+    '''
+    def __init__(self, recorder):
+        super().__init__()
+        self.recorder = recorder
+
+    def insert(self, data):
+        self.recorder.add('PriorityQueue.updates' if data[0] in self.position else 'PriorityQueue.inserts')
+        super().insert(data)
+
+    def update(self, vertex, val):
+        self.recorder.add('PriorityQueue.updates')
+        super().update(vertex, val)
+
+    def pop(self):
+        self.recorder.add('PriorityQueue.pops')
+        return super().pop()
+
+
+def make_priority_queue():
+    '''
+    :return: A PriorityQueue, counting into the active Recorder if instrumentation is recording
+    '''
+    recorder = instrumentation.active
+    return PriorityQueue() if recorder is None else CountingPriorityQueue(recorder)
+
+
+class ListPriorityQueue:
+    '''
+    The original list scan priority queue. It is only kept as a baseline for time_priority_queue
+    '''
+    def __init__(self):
+        self.queue = []
+
+    def isEmpty(self):
+        return len(self.queue) == 0
+
+    def insert(self, data):
+        self.queue.append(data)
+
+    def update(self, vertex, val):
         for i in range(len(self.queue)):
+            if self.queue[i][0] == vertex:
+                self.queue[i][1] = val
 
+    def pop(self):
+        minVal = 0
+        if len(self.queue) == 0:
+            return -1
+        for i in range(len(self.queue)):
             if self.queue[i][1] < self.queue[minVal][1]:
                 minVal = i
-
         item = self.queue[minVal]
         del self.queue[minVal]
         return item
 
+
+def time_priority_queue(sizes=(1000, 4000, 16000)):
+    '''
+    This function is used to time the heap backed PriorityQueue against the list scan ListPriorityQueue on a
+    workload of n inserts, n decrease-key updates and n pops using random priorities.
+    :param sizes: The queue sizes to time
+    :return results: a list of tuples representing the size, the list queue time and the heap queue time
+    '''
+    results = []
+    for n in sizes:
+        priorities = [random.random() for _ in range(n)]
+        updates = [(random.randrange(n), random.random() / 2) for _ in range(n)]
+        times = []
+        for queue_class in (ListPriorityQueue, PriorityQueue):
+            start_time = timeit.default_timer()
+            Q = queue_class()
+            for x in range(n):
+                Q.insert([x, priorities[x]])
+            for vertex, val in updates:
+                Q.update(vertex, val)
+            while not Q.isEmpty():
+                Q.pop()
+            times.append(timeit.default_timer() - start_time)
+        results.append((n, times[0], times[1]))
+    return results
+
 class UnionFind:
     '''
-    This class impliments the unionfind data structure to reduce the cost of kruskals algorithm.
+    This class impliments the unionfind data structure to reduce the cost of kruskals algorithm. Sets are joined by
+    size and find halves the path it walks, so any sequence of operations costs near inverse Ackermann time each.
+    The parents and set sizes are kept in compact array('i') buffers.
     '''
     def __init__(self, n):
         '''
@@ -68,30 +248,80 @@ class UnionFind:
         Complexity: O(n) where n is the number of vertecies
         :param n: the number of vertecies
         '''
-        self.VertexID = [i for i in range(n)]
-        self.Parent = [i for i in range(n)]
+        self.VertexID = array('i', range(n))
+        self.Parent = array('i', range(n))
+        self.Size = array('i', [1]) * n
+        self.count = n
 
     def Union(self, u, v):
         '''
-        This function joins two sets with the same id
+        This function joins two sets with the same id, the smaller set is hung under the root of the larger one
+        Complexity: O(a(n)) amortised where a is the inverse Ackermann function
         :param u: a vertex in one set
         :param v: a vertex in another
-        :return: na
+        :return: True if the sets were different and have been joined
         '''
         u_val = self.find(u)
         v_val = self.find(v)
+        if u_val == v_val:
+            return False
+        if self.Size[u_val] < self.Size[v_val]:
+            u_val, v_val = v_val, u_val
         self.Parent[v_val] = u_val
+        self.Size[u_val] += self.Size[v_val]
+        self.count -= 1
+        return True
 
     def find(self, vert):
         '''
-        This function finds and returns the set id of a vertex
+        This function finds and returns the set id of a vertex. Every vertex visited is pointed at its grandparent
+        Complexity: O(a(n)) amortised where a is the inverse Ackermann function
         :param vert: The vertex in question
         :return: The set ID
         '''
-        while self.Parent[vert] != vert:
-           vert = self.Parent[vert]
+        parent = self.Parent
+        while parent[vert] != vert:
+            parent[vert] = parent[parent[vert]]
+            vert = parent[vert]
         return vert
 
+    def union_many(self, us, vs):
+        '''
+        This function joins the sets of each pair (us[i], vs[i]) in order
+        Complexity: O(ka(n)) where k is the number of pairs
+        :param us: An iterable of vertices
+        :param vs: An iterable of vertices paired with us
+        :return: A bytearray holding 1 for each pair which joined two different sets
+        '''
+        Union = self.Union
+        return bytearray(Union(u, v) for u, v in zip(us, vs))
+
+    def find_many(self, verts):
+        '''
+        This function finds the set id of each vertex in verts
+        Complexity: O(ka(n)) where k is the number of vertices
+        :param verts: An iterable of vertices
+        :return: An array('i') of set IDs
+        '''
+        return array('i', map(self.find, verts))
+
+    def size(self, vert):
+        '''
+        This function returns the number of vertices in the set holding vert
+        Complexity: O(a(n)) amortised, O(1) for a root
+        :param vert: The vertex in question
+        :return: The size of the set
+        '''
+        return self.Size[self.find(vert)]
+
+    def components(self):
+        '''
+        This function returns the number of disjoint sets
+        Complexity: O(1)
+        :return: The number of sets
+        '''
+        return self.count
+
     def print(self):
         '''
         A print function for displaying the state
@@ -102,192 +332,1758 @@ class UnionFind:
         print('parent: ')
         print(self.Parent)
 
+class CountingUnionFind(UnionFind):
+    '''
+    A UnionFind which counts its finds and the parent links they walk into a Recorder. It is used in place of
+    UnionFind while instrumentation is recording so the plain find carries no counting cost
+    '''
+    def __init__(self, n, recorder):
+        super().__init__(n)
+        self.recorder = recorder
+
+    def find(self, vert):
+        parent = self.Parent
+        hops = 0
+        while parent[vert] != vert:
+            parent[vert] = parent[parent[vert]]
+            vert = parent[vert]
+            hops += 1
+        self.recorder.add('UnionFind.finds')
+        self.recorder.add('UnionFind.find_hops', hops)
+        return vert
+
+
+def make_union_find(n):
+    '''
+    :param n: the number of vertecies
+    :return: A UnionFind, counting into the active Recorder if instrumentation is recording
+    '''
+    recorder = instrumentation.active
+    return UnionFind(n) if recorder is None else CountingUnionFind(n, recorder)
+
+
+def read_edge_file(gfile, chunk_size=1 << 20):
+    '''
+    This function streams a graph file in chunks of chunk_size bytes. The first token is the number of nodes and
+    each following triple of tokens is an edge "x y weight". A token that is cut by the end of a chunk is held back
+    and joined to the next chunk so the whole file is never held in memory at once.
+    Complexity: O(E) Where E is the number of edges in the file
+    :param gfile: a file name to import the graph data from
+    :param chunk_size: The number of bytes read per chunk
+    :return: A tuple containing the number of nodes and typed arrays of edge sources, targets and weights
+    '''
+    edgeU = array('i')
+    edgeV = array('i')
+    edgeW = array('q')
+    num_nodes = None
+    tokens = []
+    tail = b''
+    with open(gfile, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                tokens += tail.split()
+                tail = b''
+            else:
+                chunk = tail + chunk
+                # hold back the last token if it may continue in the next chunk
+                if chunk[-1:].isspace():
+                    tail = b''
+                    tokens += chunk.split()
+                else:
+                    split = chunk.split()
+                    tail = split.pop()
+                    tokens += split
+            if num_nodes is None and len(tokens) > 0:
+                num_nodes = int(tokens[0])
+                tokens = tokens[1:]
+            # convert every complete edge triple read so far
+            usable = len(tokens) - len(tokens) % 3
+            edgeU.extend(map(int, tokens[0:usable:3]))
+            edgeV.extend(map(int, tokens[1:usable:3]))
+            edgeW.extend(map(int, tokens[2:usable:3]))
+            tokens = tokens[usable:]
+            if not chunk:
+                break
+    return num_nodes, edgeU, edgeV, edgeW
+
+
+def build_csr(num_nodes, edgeU, edgeV, edgeW):
+    '''
+    This function builds a compressed sparse row representation of an undirected graph. The neighbours of vertex u
+    are neighbours[offsets[u]:offsets[u+1]] and the matching edge weights are weights[offsets[u]:offsets[u+1]]
+    Complexity: O(V + E) Where V is the number of vertices and E is the number of edges
+    :param num_nodes: The number of vertices
+    :param edgeU: An array of edge sources
+    :param edgeV: An array of edge targets
+    :param edgeW: An array of edge weights
+    :return: A tuple containing the offsets, neighbours and weights arrays
+    '''
+    # count the degree of each vertex one slot to the right so the prefix sum gives the offsets
+    offsets = array('q', bytes(8 * (num_nodes + 1)))
+    for u in edgeU:
+        offsets[u + 1] += 1
+    for v in edgeV:
+        offsets[v + 1] += 1
+    for u in range(num_nodes):
+        offsets[u + 1] += offsets[u]
+
+    # place each edge in the rows of both of its endpoints
+    fill = array('q', offsets)
+    neighbours = array('i', bytes(4 * offsets[num_nodes]))
+    weights = array('q', bytes(8 * offsets[num_nodes]))
+    for i in range(len(edgeU)):
+        u = edgeU[i]
+        v = edgeV[i]
+        neighbours[fill[u]] = v
+        weights[fill[u]] = edgeW[i]
+        fill[u] += 1
+        neighbours[fill[v]] = u
+        weights[fill[v]] = edgeW[i]
+        fill[v] += 1
+    return offsets, neighbours, weights
+
+
+def build_slack_csr(num_nodes, edgeU, edgeV, edgeW):
+    '''
+    This function builds the compressed sparse row arrays like build_csr but leaves free slots at the end of every
+    row so edges can be added in place. A free slot of row u holds u itself with weight 0, a self loop which no
+    search can improve a distance with, so the arrays can be read exactly like those of build_csr. The used part of
+    the row of u is neighbours[offsets[u]:ends[u]]
+    Complexity: O(V + E) Where V is the number of vertices and E is the number of edges
+    :param num_nodes: The number of vertices
+    :param edgeU: An array of edge sources
+    :param edgeV: An array of edge targets
+    :param edgeW: An array of edge weights
+    :return: A tuple containing the offsets, neighbours, weights and ends arrays
+    '''
+    degree = array('q', bytes(8 * num_nodes))
+    for u in edgeU:
+        degree[u] += 1
+    for v in edgeV:
+        degree[v] += 1
+    # every row gets half its degree again and two more slots
+    offsets = array('q', bytes(8 * (num_nodes + 1)))
+    neighbours = array('i')
+    for u in range(num_nodes):
+        size = degree[u] + (degree[u] >> 1) + 2
+        offsets[u + 1] = offsets[u] + size
+        neighbours.extend(array('i', [u]) * size)
+    weights = array('q', bytes(8 * offsets[num_nodes]))
+
+    # place each edge in the rows of both of its endpoints
+    ends = offsets[:num_nodes]
+    for i in range(len(edgeU)):
+        u = edgeU[i]
+        v = edgeV[i]
+        neighbours[ends[u]] = v
+        weights[ends[u]] = edgeW[i]
+        ends[u] += 1
+        neighbours[ends[v]] = u
+        weights[ends[v]] = edgeW[i]
+        ends[v] += 1
+    return offsets, neighbours, weights, ends
+
+
+GRAPH_CACHE_MAGIC = b'GRAPHCSR'
+GRAPH_CACHE_VERSION = 1
+# magic, version, byte order marker, source size, source mtime, number of nodes, number of edges. The header is
+# packed in native byte order like the arrays after it, so the marker only reads back on a host of the same order
+GRAPH_CACHE_HEADER = struct.Struct('=8sIIqqqq')
+# the arrays stored in the cache file in order with their typecodes
+GRAPH_CACHE_ARRAYS = [('offsets', 'q'), ('neighbours', 'i'), ('weights', 'q'), ('edgeU', 'i'), ('edgeV', 'i'),
+                      ('edgeW', 'q'), ('edgeOrder', 'i')]
+
+
+def write_graph_cache(cache_file, gfile, num_nodes, arrays):
+    '''
+    This function writes the arrays of a graph into a binary cache file. Each array starts on an 8 byte boundary
+    so it can be cast straight out of a memory map. The file is written to a temporary name and then renamed so
+    readers never see a partial file.
+    Complexity: O(V + E) Where V is the number of vertices and E is the number of edges
+    :param cache_file: The file name of the cache to write
+    :param gfile: The graph file the arrays were built from
+    :param num_nodes: The number of vertices
+    :param arrays: A dictionary mapping each name in GRAPH_CACHE_ARRAYS to its array
+    :return: n/a
+    '''
+    stat = os.stat(gfile)
+    temp_file = cache_file + '.%d.tmp' % os.getpid()
+    with open(temp_file, 'wb') as f:
+        f.write(GRAPH_CACHE_HEADER.pack(GRAPH_CACHE_MAGIC, GRAPH_CACHE_VERSION, 0x01020304, stat.st_size,
+                                        stat.st_mtime_ns, num_nodes, len(arrays['edgeU'])))
+        for name, typecode in GRAPH_CACHE_ARRAYS:
+            f.write(bytes(-f.tell() % 8))
+            f.write(memoryview(arrays[name]).cast('B'))
+    os.replace(temp_file, cache_file)
+
+
+def load_graph_cache(cache_file, gfile):
+    '''
+    This function memory maps a binary cache file written by write_graph_cache and returns typed memoryviews over
+    the mapped pages, so no array is copied and processes loading the same cache share its pages. The cache is
+    rejected if it has a different version or byte order or if the size or modification time of gfile has changed.
+    Complexity: O(1)
+    :param cache_file: The file name of the cache to load
+    :param gfile: The graph file the cache was built from
+    :return: A tuple containing the memory map, the number of vertices and a dictionary of the arrays, or None if
+    the cache is missing or stale
+    '''
+    try:
+        stat = os.stat(gfile)
+        f = open(cache_file, 'rb')
+    except OSError:
+        return None
+    with f:
+        header = f.read(GRAPH_CACHE_HEADER.size)
+        if len(header) < GRAPH_CACHE_HEADER.size:
+            return None
+        magic, version, marker, size, mtime, num_nodes, num_edges = GRAPH_CACHE_HEADER.unpack(header)
+        if magic != GRAPH_CACHE_MAGIC or version != GRAPH_CACHE_VERSION or marker != 0x01020304:
+            return None
+        if size != stat.st_size or mtime != stat.st_mtime_ns:
+            return None
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    lengths = {'offsets': num_nodes + 1, 'neighbours': 2 * num_edges, 'weights': 2 * num_edges}
+    view = memoryview(mm)
+    position = GRAPH_CACHE_HEADER.size
+    arrays = {}
+    for name, typecode in GRAPH_CACHE_ARRAYS:
+        position += -position % 8
+        nbytes = lengths.get(name, num_edges) * array(typecode).itemsize
+        if position + nbytes > len(mm):
+            return None
+        arrays[name] = view[position:position + nbytes].cast(typecode)
+        position += nbytes
+    return mm, num_nodes, arrays
+
+
+def compile_graph(gfile, cache_file=None):
+    '''
+    This function compiles a graph file into a binary cache so later Graph(gfile, cache=...) constructions can
+    memory map it instead of parsing the text again
+    Complexity: O(V + Elog(E)) Where V is the number of vertices and E is the number of edges
+    :param gfile: a file name to import the graph data from
+    :param cache_file: The file name of the cache, by default gfile with a .gcache suffix
+    :return: The file name of the cache
+    '''
+    if cache_file is None:
+        cache_file = gfile + '.gcache'
+    num_nodes, edgeU, edgeV, edgeW = read_edge_file(gfile)
+    offsets, neighbours, weights = build_csr(num_nodes, edgeU, edgeV, edgeW)
+    edgeOrder = array('i', sorted(range(len(edgeW)), key=edgeW.__getitem__))
+    write_graph_cache(cache_file, gfile, num_nodes, {'offsets': offsets, 'neighbours': neighbours,
+                                                     'weights': weights, 'edgeU': edgeU, 'edgeV': edgeV,
+                                                     'edgeW': edgeW, 'edgeOrder': edgeOrder})
+    return cache_file
+
+
+LANDMARK_MAGIC = b'LANDMARK'
+LANDMARK_VERSION = 2
+# magic, version, byte order marker, number of nodes, number of edges, graph fingerprint, number of landmarks, in
+# native byte order like GRAPH_CACHE_HEADER
+LANDMARK_HEADER = struct.Struct('=8sIIqqQq')
+
+
+def graph_fingerprint(edgeU, edgeV, edgeW):
+    '''
+    This function hashes the edge arrays of a graph, so files derived from it such as landmarks can tell a graph
+    with the same number of vertices and edges but other edges or weights apart
+    Complexity: O(E) Where E is the number of edges
+    :param edgeU: An array of edge sources
+    :param edgeV: An array of edge targets
+    :param edgeW: An array of edge weights
+    :return: A 64 bit integer
+    '''
+    digest = hashlib.blake2b(digest_size=8)
+    for edges in (edgeU, edgeV, edgeW):
+        digest.update(memoryview(edges).cast('B'))
+    return int.from_bytes(digest.digest(), 'little')
+
+
+def write_landmarks(landmark_file, num_nodes, num_edges, fingerprint, landmarks, distances):
+    '''
+    This function writes the landmarks of a graph and their distance arrays into a binary file, the distance arrays
+    starting on an 8 byte boundary after the landmark vertices. The file is written to a temporary name and then
+    renamed so readers never see a partial file.
+    Complexity: O(kV) Where k is the number of landmarks and V is the number of vertices
+    :param landmark_file: The file name to write
+    :param num_nodes: The number of vertices of the graph
+    :param num_edges: The number of edges of the graph
+    :param fingerprint: The graph_fingerprint of the graph
+    :param landmarks: An array('i') of the landmark vertices
+    :param distances: A list holding the array('q') of distances from each landmark, -1 for unreachable vertices
+    :return: n/a
+    '''
+    temp_file = landmark_file + '.%d.tmp' % os.getpid()
+    with open(temp_file, 'wb') as f:
+        f.write(LANDMARK_HEADER.pack(LANDMARK_MAGIC, LANDMARK_VERSION, 0x01020304, num_nodes, num_edges,
+                                     fingerprint, len(landmarks)))
+        f.write(memoryview(landmarks).cast('B'))
+        for dist in distances:
+            f.write(bytes(-f.tell() % 8))
+            f.write(memoryview(dist).cast('B'))
+    os.replace(temp_file, landmark_file)
+
+
+def read_landmarks(landmark_file, num_nodes, num_edges, fingerprint):
+    '''
+    This function reads a file written by write_landmarks. The file is rejected unless it was built for a graph with
+    the same vertices, edges and graph_fingerprint, as the distances of another graph could overestimate
+    Complexity: O(kV) Where k is the number of landmarks and V is the number of vertices
+    :param landmark_file: The file name to read
+    :param num_nodes: The number of vertices of the graph the landmarks are for
+    :param num_edges: The number of edges of the graph the landmarks are for
+    :param fingerprint: The graph_fingerprint of the graph the landmarks are for
+    :return: A tuple containing the array('i') of landmarks and the list of their distance arrays
+    '''
+    with open(landmark_file, 'rb') as f:
+        header = f.read(LANDMARK_HEADER.size)
+        if len(header) < LANDMARK_HEADER.size:
+            raise ValueError('%s is not a landmark file' % landmark_file)
+        magic, version, marker, nodes, edges, digest, k = LANDMARK_HEADER.unpack(header)
+        if magic != LANDMARK_MAGIC or version != LANDMARK_VERSION or marker != 0x01020304:
+            raise ValueError('%s is not a landmark file of this version and byte order' % landmark_file)
+        if nodes != num_nodes or edges != num_edges or digest != fingerprint:
+            raise ValueError('%s was built for a different graph' % landmark_file)
+        landmarks = array('i')
+        landmarks.fromfile(f, k)
+        distances = []
+        for _ in range(k):
+            f.read(-f.tell() % 8)
+            dist = array('q')
+            dist.fromfile(f, num_nodes)
+            distances.append(dist)
+    return landmarks, distances
+
+
+def bfs_eccentricity(offsets, neighbours, source):
+    '''
+    This function runs a breadth first search over a graph in compressed sparse row form
+    Complexity: O(V + E) Where V is the number of vertices and E is the number of edges
+    :param offsets: The row offsets of the graph
+    :param neighbours: The neighbour array of the graph
+    :param source: The vertex to search from
+    :return: A tuple containing the eccentricity of source (inf if some vertex is unreachable) and the hop
+    distance array, where unreachable vertices are -1
+    '''
+    num_nodes = len(offsets) - 1
+    dist = array('i', [-1]) * num_nodes
+    dist[source] = 0
+    queue = array('i', [source])
+    head = 0
+    while head < len(queue):
+        u = queue[head]
+        head += 1
+        du = dist[u] + 1
+        for i in range(offsets[u], offsets[u + 1]):
+            v = neighbours[i]
+            if dist[v] < 0:
+                dist[v] = du
+                queue.append(v)
+    if len(queue) < num_nodes:
+        return math.inf, dist
+    return dist[queue[-1]], dist
+
+
+_center_offsets = None
+_center_neighbours = None
+
+
+def _init_center_worker(specs):
+    '''
+    Pool initializer which attaches each worker process to the graph arrays shared by _graph_center_pool
+    '''
+    global _center_offsets, _center_neighbours
+    # memoryviews index to plain ints, which the search loop handles faster than NumPy scalars
+    _center_offsets, _center_neighbours = [memoryview(a) for a in attach_arrays(specs)]
+
+
+def _center_worker_eccentricity(v):
+    '''
+    Returns the eccentricity of v using the graph stored by _init_center_worker
+    '''
+    return bfs_eccentricity(_center_offsets, _center_neighbours, v)[0]
+
+
+def graph_center(offsets, neighbours, sweeps=4, workers=None):
+    '''
+    This function finds the vertex of minimum eccentricity (the root of the shallowest spanning tree) of a graph in
+    compressed sparse row form. Every breadth first search from a vertex s tightens the bounds of every other
+    vertex v using the triangle inequality, max(d(s, v), ecc(s) - d(s, v)) <= ecc(v) <= ecc(s) + d(s, v), and
+    vertices whose lower bound exceeds the best upper bound, or equals it when a smaller vertex is known to reach
+    it, are pruned. Searches alternate between the candidate with the smallest lower bound and the unresolved vertex
+    with the largest upper bound. After sweeps searches the remaining candidates can be fanned out over a process
+    pool of workers processes sharing the graph arrays in shared memory, which needs NumPy.
+    Complexity: O(k(V + E)) Where k is the number of searches run, at worst V, V is the number of vertices and E
+    is the number of edges
+    :param offsets: The row offsets of the graph
+    :param neighbours: The neighbour array of the graph
+    :param sweeps: The number of searches run before the candidates are handed to the pool
+    :param workers: The number of worker processes, None or 1 to run every search in this process
+    :return: A tuple containing the smallest vertex of minimum eccentricity and its eccentricity
+    '''
+    num_nodes = len(offsets) - 1
+    # a disconnected graph has no spanning tree, every vertex has an infinite height
+    ecc, dist = bfs_eccentricity(offsets, neighbours, 0)
+    if ecc == math.inf:
+        return (0, math.inf)
+
+    lower = array('i', [0]) * num_nodes
+    upper = array('i', [num_nodes]) * num_nodes
+    best = num_nodes
+    searches = 0
+    source = 0
+    while True:
+        # tighten the bounds of every vertex from the search rooted at source
+        for v in range(num_nodes):
+            d = dist[v]
+            bound = ecc - d if ecc - d > d else d
+            if bound > lower[v]:
+                lower[v] = bound
+            if ecc + d < upper[v]:
+                upper[v] = ecc + d
+        lower[source] = upper[source] = ecc
+        if ecc < best:
+            best = ecc
+        best = min(best, min(upper))
+        searches += 1
+
+        # a vertex which can at best tie with a smaller vertex known to reach best cannot be the answer
+        root = upper.index(best)
+        candidates = [v for v in range(num_nodes) if lower[v] != upper[v] and
+                      (lower[v] < best or lower[v] == best and v < root)]
+        if len(candidates) == 0:
+            break
+        if workers is not None and workers > 1 and np is not None and searches >= sweeps:
+            best = _graph_center_pool(offsets, neighbours, candidates, lower, upper, best, workers)
+            break
+        # alternate between the most central candidate and the most peripheral unresolved vertex, whose search
+        # gives the tightest lower bounds whether or not it could be the center itself
+        if searches % 2 == 1:
+            source = min(candidates, key=lambda v: (lower[v], v))
+        else:
+            source = max((v for v in range(num_nodes) if lower[v] != upper[v]), key=lambda v: (upper[v], -v))
+        ecc, dist = bfs_eccentricity(offsets, neighbours, source)
+
+    # every vertex that can still reach the minimum has it exactly
+    for v in range(num_nodes):
+        if upper[v] == best:
+            return (v, best)
+
+
+def _graph_center_pool(offsets, neighbours, candidates, lower, upper, best, workers):
+    '''
+    This function resolves the eccentricity of the remaining graph_center candidates in a process pool. Candidates
+    are dispatched in order of lower bound in batches and pruned against the best eccentricity found so far after
+    each batch. The workers attach to the graph arrays in shared memory rather than receiving pickled copies.
+    :return: The minimum eccentricity, with lower and upper updated in place
+    '''
+    candidates.sort(key=lambda v: (lower[v], v))
+    batch_size = 4 * workers
+    blocks, specs = share_arrays([np.frombuffer(offsets, dtype=np.int64), np.frombuffer(neighbours, dtype=np.int32)])
+    try:
+        with multiprocessing.Pool(workers, initializer=_init_center_worker, initargs=(specs,)) as pool:
+            while len(candidates) > 0:
+                batch = candidates[:batch_size]
+                for v, ecc in zip(batch, pool.map(_center_worker_eccentricity, batch)):
+                    lower[v] = upper[v] = ecc
+                    if ecc < best:
+                        best = ecc
+                root = upper.index(best)
+                candidates = [v for v in candidates[batch_size:] if lower[v] < best or lower[v] == best and v < root]
+    finally:
+        release_arrays(blocks)
+    return best
+
+
+class ShortestPaths:
+    '''
+    This class is a lazy sequence of the shortest paths found by dijkstra. Only the predecessor of each vertex is
+    stored and paths[v] rebuilds the path from the start to v when it is asked for
+    '''
+    def __init__(self, predecessor, start):
+        '''
+        Constructor
+        Complexity: O(1)
+        :param predecessor: An array holding the predecessor of each vertex, -1 for the start and unreached vertices
+        :param start: The vertex the paths begin at
+        '''
+        self.predecessor = predecessor
+        self.start = start
+
+    def __len__(self):
+        return len(self.predecessor)
+
+    def __getitem__(self, vertex):
+        '''
+        This function rebuilds the path from the start to vertex
+        Complexity: O(L) Where L is the number of vertices in the path
+        :param vertex: The vertex the path ends at
+        :return: The list of vertices on the path, or an empty list if the vertex was not reached
+        '''
+        if vertex == self.start:
+            return [vertex]
+        if self.predecessor[vertex] < 0:
+            return []
+        path = [vertex]
+        while vertex != self.start:
+            vertex = self.predecessor[vertex]
+            path.append(vertex)
+        path.reverse()
+        return path
+
+    def __iter__(self):
+        for vertex in range(len(self.predecessor)):
+            yield self[vertex]
+
+
+def csr_dijkstra(offsets, neighbours, weights, start, targets=None):
+    '''
+    This is an implementation of dijkstra's algorithm over the compressed sparse row arrays of a graph, used by
+    Graph.dijkstra and by the worker processes of Graph.distance_matrix. If targets is given the search stops as soon
+    as every target has been settled, in which case only the distances of settled vertices are final
+    Complexity: O(Elog(V)) Where E is the number of edges and V is the number of vertices
+    :param offsets: The row offsets of the graph
+    :param neighbours: The neighbour array of the graph
+    :param weights: The edge weights matching neighbours
+    :param start: The node to start as
+    :param targets: An optional iterable of vertices after which the search can stop
+    :return: A tuple containing the list of distances, inf for unreached vertices, and the array of predecessors
+    '''
+    num_nodes = len(offsets) - 1
+    # init containers for storing values
+    dist = [math.inf for _ in range(num_nodes)]
+    dist[start] = 0
+    predecessor = array('i', [-1]) * num_nodes
+    remaining = None if targets is None else set(targets)
+    recorder = instrumentation.active
+    pq = make_priority_queue()
+    pq.insert([start, 0])
+    # while the queue is not empty
+    while not pq.isEmpty():
+        currentNode, currentDist = pq.pop()
+        if recorder is not None:
+            recorder.add('dijkstra.relaxations', offsets[currentNode + 1] - offsets[currentNode])
+        # stop once every target is settled
+        if remaining is not None:
+            remaining.discard(currentNode)
+            if len(remaining) == 0:
+                break
+
+        # for each neighbour of the current node
+        for i in range(offsets[currentNode], offsets[currentNode + 1]):
+            neighbour = neighbours[i]
+            distance = currentDist + weights[i]
+            # if the distance is less than the stored distance
+            if distance < dist[neighbour]:
+                dist[neighbour] = distance
+                predecessor[neighbour] = currentNode
+                # a neighbour that is already queued has its key decreased rather than being queued twice
+                pq.insert([neighbour, distance])
+    return dist, predecessor
+
+
+def distance_array(dist):
+    '''
+    This function packs the distances of csr_dijkstra into an array('q'), the form the path cache, the landmarks and
+    the worker processes of distance_matrix hold them in
+    Complexity: O(V) Where V is the number of vertices
+    :param dist: A list of distances, inf for unreached vertices
+    :return: An array('q') of the distances with -1 for unreached vertices
+    '''
+    return array('q', [d if d < math.inf else -1 for d in dist])
+
+
+_dijkstra_arrays = None
+
+
+def _init_dijkstra_worker(specs):
+    '''
+    Pool initializer which attaches each worker process to the shared graph arrays of distance_matrix
+    '''
+    global _dijkstra_arrays
+    # memoryviews index to plain ints, which the search loop handles faster than NumPy scalars
+    _dijkstra_arrays = [memoryview(a) for a in attach_arrays(specs)]
+
+
+def _dijkstra_worker(source):
+    '''
+    Runs csr_dijkstra from source over the arrays attached by _init_dijkstra_worker
+    :return: The distances as an array('q') with -1 for unreached vertices, and the predecessor array
+    '''
+    dist, predecessor = csr_dijkstra(*_dijkstra_arrays, source)
+    return distance_array(dist), predecessor
+
+
+# the default number of bytes the shortest path tree cache of a Graph may hold
+PATH_CACHE_BUDGET = 1 << 28
+
+
+class ShortestPathCache:
+    '''
+    This class is a least recently used cache of the single source shortest path trees of a graph, each held as an
+    array('q') of distances, -1 for unreached vertices, and an array('i') of predecessors. Trees are evicted from the
+    least recently used end once their total size exceeds the memory budget, and hits, misses and evictions are
+    counted.
+    '''
+    def __init__(self, memory_budget=PATH_CACHE_BUDGET):
+        '''
+        Constructor
+        Complexity: O(1)
+        :param memory_budget: The largest number of bytes the cached arrays may take
+        '''
+        self.memory_budget = memory_budget
+        self.trees = collections.OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.trees)
+
+    def __contains__(self, source):
+        return source in self.trees
+
+    def get(self, source):
+        '''
+        This function looks up the tree of source and marks it as the most recently used
+        Complexity: O(1)
+        :param source: The source vertex
+        :return: A tuple of the distance and predecessor arrays, or None if the tree is not cached
+        '''
+        tree = self.trees.get(source)
+        if tree is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.trees.move_to_end(source)
+        return tree
+
+    def put(self, source, dist, predecessor):
+        '''
+        This function caches the tree of source, evicting the least recently used trees to stay within the budget.
+        A tree larger than the whole budget is not cached
+        Complexity: O(1) amortised
+        :param source: The source vertex
+        :param dist: The array('q') of distances
+        :param predecessor: The array('i') of predecessors
+        :return: n/a
+        '''
+        size = dist.itemsize * len(dist) + predecessor.itemsize * len(predecessor)
+        if size > self.memory_budget:
+            return
+        if source in self.trees:
+            old = self.trees.pop(source)
+            self.nbytes -= old[0].itemsize * len(old[0]) + old[1].itemsize * len(old[1])
+        while self.nbytes + size > self.memory_budget:
+            evicted = self.trees.popitem(last=False)[1]
+            self.nbytes -= evicted[0].itemsize * len(evicted[0]) + evicted[1].itemsize * len(evicted[1])
+            self.evictions += 1
+        self.trees[source] = (dist, predecessor)
+        self.nbytes += size
+
+    def clear(self):
+        '''
+        This function drops every cached tree, as when the graph changes. The counters are kept
+        Complexity: O(1)
+        '''
+        self.trees.clear()
+        self.nbytes = 0
+
+    def stats(self):
+        '''
+        :return: A dictionary of the hits, misses, evictions, number of trees, bytes held and memory budget
+        '''
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'trees': len(self.trees),
+                'nbytes': self.nbytes, 'memory_budget': self.memory_budget}
+
+
+class ErrandSearch:
+    '''
+    This class is a resumable dijkstra search over the layered product graph of (vertex, stage) states used by
+    shortest_errand. A state (v, k) moves to (v, k+1) for free when v is in checkpoints[k], so reaching a state of the
+    last stage means every checkpoint set has been visited in order. The search keeps its frontier between calls to
+    settle so many targets can be answered by one search, and it may be seeded from several sources at once.
+    '''
+    def __init__(self, graph, seeds, checkpoints):
+        '''
+        Constructor
+        Complexity: O(SV) Where S is the number of stages and V is the number of vertices
+        :param graph: The Graph to search
+        :param seeds: An iterable of (vertex, distance) pairs the search starts from
+        :param checkpoints: A list of vertex sets which must be visited in order
+        '''
+        self.graph = graph
+        self.checkpoints = [set(c) for c in checkpoints]
+        self.stages = len(self.checkpoints) + 1
+        num_states = graph.num_nodes * self.stages
+        self.dist = [math.inf for _ in range(num_states)]
+        self.predecessor = array('i', [-1]) * num_states
+        self.settled = bytearray(num_states)
+        self.pq = make_priority_queue()
+        for vertex, distance in seeds:
+            if distance < self.dist[vertex]:
+                self.dist[vertex] = distance
+                self.pq.insert([vertex, distance])
+
+    def settle(self, vertex):
+        '''
+        This function continues the search until vertex has been settled in the last stage
+        Complexity: O(SElog(SV)) over all calls Where S is the number of stages, E is the number of edges and V is
+        the number of vertices
+        :param vertex: The vertex to settle
+        :return: The distance to vertex in the last stage, inf if it cannot be reached
+        '''
+        num_nodes = self.graph.num_nodes
+        offsets = self.graph.offsets
+        neighbours = self.graph.neighbours
+        weights = self.graph.weights
+        dist = self.dist
+        predecessor = self.predecessor
+        settled = self.settled
+        pq = self.pq
+        target = (self.stages - 1) * num_nodes + vertex
+        recorder = instrumentation.active
+        while not settled[target] and not pq.isEmpty():
+            state, currentDist = pq.pop()
+            settled[state] = 1
+            stage, currentNode = divmod(state, num_nodes)
+            if recorder is not None:
+                recorder.add('ErrandSearch.relaxations', offsets[currentNode + 1] - offsets[currentNode])
+            base = state - currentNode
+            # move to the next stage for free at a checkpoint
+            if stage < self.stages - 1 and currentNode in self.checkpoints[stage]:
+                nextState = state + num_nodes
+                if currentDist < dist[nextState]:
+                    dist[nextState] = currentDist
+                    predecessor[nextState] = state
+                    pq.insert([nextState, currentDist])
+            # for each neighbour of the current node in the same stage
+            for i in range(offsets[currentNode], offsets[currentNode + 1]):
+                nextState = base + neighbours[i]
+                distance = currentDist + weights[i]
+                if distance < dist[nextState]:
+                    dist[nextState] = distance
+                    predecessor[nextState] = state
+                    pq.insert([nextState, distance])
+        return dist[target]
+
+    def path(self, vertex):
+        '''
+        This function rebuilds the path to vertex in the last stage once it has been settled
+        Complexity: O(L) Where L is the number of states on the path
+        :param vertex: The vertex the path ends at
+        :return: The list of vertices on the path, a vertex is listed once when the path changes stage on it
+        '''
+        num_nodes = self.graph.num_nodes
+        state = (self.stages - 1) * num_nodes + vertex
+        if self.dist[state] == math.inf:
+            return []
+        path = [vertex]
+        while self.predecessor[state] >= 0:
+            state = self.predecessor[state]
+            if state % num_nodes != path[-1]:
+                path.append(state % num_nodes)
+        path.reverse()
+        return path
+
+
+def share_arrays(arrays):
+    '''
+    This function copies NumPy arrays into shared memory blocks so worker processes can attach to them without
+    pickling their contents
+    Complexity: O(n) Where n is the total size of the arrays
+    :param arrays: A list of NumPy arrays
+    :return: A tuple containing the list of SharedMemory blocks, which the caller must close and unlink, and the list
+    of (name, dtype, shape) specs to pass to attach_arrays
+    '''
+    blocks = []
+    specs = []
+    for a in arrays:
+        block = shared_memory.SharedMemory(create=True, size=max(a.nbytes, 1))
+        np.ndarray(a.shape, dtype=a.dtype, buffer=block.buf)[...] = a
+        blocks.append(block)
+        specs.append((block.name, a.dtype.str, a.shape))
+    return blocks, specs
+
+
+_attached_blocks = {}
+
+
+def attach_arrays(specs):
+    '''
+    This function attaches to shared memory blocks made by share_arrays. The blocks stay open for the life of the
+    process so the returned arrays remain valid
+    Complexity: O(1) per array
+    :param specs: The list of (name, dtype, shape) specs returned by share_arrays
+    :return: A list of NumPy arrays backed by the shared memory
+    '''
+    arrays = []
+    for name, dtype, shape in specs:
+        if name not in _attached_blocks:
+            _attached_blocks[name] = shared_memory.SharedMemory(name=name)
+        arrays.append(np.ndarray(shape, dtype=dtype, buffer=_attached_blocks[name].buf))
+    return arrays
+
+
+def release_arrays(blocks):
+    '''
+    This function closes and unlinks the shared memory blocks made by share_arrays
+    :param blocks: The list of SharedMemory blocks
+    :return: n/a
+    '''
+    for block in blocks:
+        block.close()
+        block.unlink()
+
+
+def _kruskal_edges(Union, edgeU, edgeV, edges, mst):
+    '''
+    Runs kruskals algorithm over the edge indices in edges, which must already be in weight order, appending each
+    edge that joins two sets to mst
+    '''
+    for i in edges:
+        if Union.Union(edgeU[i], edgeV[i]):
+            mst.append(i)
+
+
+def _filter_kruskal(Union, U, V, W, mst, base_size=4096):
+    '''
+    This function is an implementation of the filter kruskal algorithm over NumPy edge arrays. Edges are split
+    around a pivot weight, the light half is processed first and the heavy half is then filtered down to the edges
+    whose endpoints are still in different sets before it is processed. Small groups are argsorted and handed to the
+    sequential kruskal loop. Ties are broken by edge index so the tree is the one found by a stable kruskal.
+    Complexity: O(E + Vlog(V)log(E/V)) expected Where E is the number of edges and V is the number of vertices
+    :param Union: The UnionFind the tree is built in
+    :param U: The edge sources as a NumPy array
+    :param V: The edge targets as a NumPy array
+    :param W: The edge weights as a NumPy array
+    :param mst: A list the indices of the tree edges are appended to
+    :return: n/a
+    '''
+    # a view of the union find parents lets the roots of many vertices be found at once
+    parent = np.frombuffer(Union.Parent, dtype=np.int32)
+    Ul = U.tolist()
+    Vl = V.tolist()
+    stack = [(np.arange(len(W)), False)]
+    while len(stack) > 0:
+        edges, heavy = stack.pop()
+        if heavy:
+            # drop every edge which would now close a cycle
+            ru = parent[U[edges]]
+            rv = parent[V[edges]]
+            while True:
+                nu = parent[ru]
+                nv = parent[rv]
+                if (nu == ru).all() and (nv == rv).all():
+                    break
+                ru, rv = nu, nv
+            edges = edges[ru != rv]
+        if len(edges) == 0:
+            continue
+        weights = W[edges]
+        if len(edges) > base_size:
+            pivot = np.median(weights[np.random.default_rng(len(edges)).integers(0, len(edges), 64)])
+            light = weights <= pivot
+            if not light.all():
+                stack.append((edges[~light], True))
+                stack.append((edges[light], False))
+                continue
+        order = edges[np.argsort(weights, kind='stable')]
+        _kruskal_edges(Union, Ul, Vl, order.tolist(), mst)
+
+
+_boruvka_edges = None
+
+
+def _init_boruvka_worker(specs):
+    '''
+    Pool initializer which attaches each worker to the shared edge arrays used by _boruvka_chunk
+    '''
+    global _boruvka_edges
+    _boruvka_edges = attach_arrays(specs)
+
+
+def _boruvka_chunk(task):
+    '''
+    Finds the lightest edge leaving each component among the edges [start, stop) of the shared edge arrays
+    :param task: A tuple of start and stop
+    :return: A tuple of the components touched and the rank of their lightest leaving edge
+    '''
+    start, stop = task
+    U, V, rank, component = _boruvka_edges
+    return _boruvka_scan(U[start:stop], V[start:stop], rank[start:stop], component)
+
+
+def _boruvka_scan(U, V, rank, component):
+    '''
+    Finds the lightest edge leaving each component among the edges given, comparing edges by rank
+    :return: A tuple of the components touched and the rank of their lightest leaving edge
+    '''
+    cu = component[U]
+    cv = component[V]
+    crossing = cu != cv
+    ends = np.concatenate((cu[crossing], cv[crossing]))
+    ranks = np.concatenate((rank[crossing], rank[crossing]))
+    return _lightest_per_component(ends, ranks)
+
+
+def _lightest_per_component(ends, ranks):
+    '''
+    Keeps the lowest rank edge of each component from parallel arrays of components and edge ranks
+    :return: A tuple of the distinct components and the rank of their lightest edge
+    '''
+    if len(ends) == 0:
+        return ends, ranks
+    # sort by component then rank and keep the first edge of each component
+    scale = int(ranks.max()) + 1
+    keys = np.sort(ends.astype(np.int64) * scale + ranks)
+    ends = keys // scale
+    first = np.ones(len(keys), dtype=bool)
+    first[1:] = ends[1:] != ends[:-1]
+    return ends[first], keys[first] % scale
+
+
+def _boruvka(Union, U, V, W, mst, workers=None):
+    '''
+    This function is an implementation of boruvkas algorithm over NumPy edge arrays. Every round the lightest edge
+    leaving each component is found and all of them are added at once, which at least halves the number of
+    components. With workers > 1 the scans of each round are split across a process pool attached to the edge
+    arrays through shared memory. Ties are broken by edge index so the tree is the one found by a stable kruskal.
+    Complexity: O(Elog(V)) Where E is the number of edges and V is the number of vertices
+    :param Union: The UnionFind the tree is built in
+    :param U: The edge sources as a NumPy array
+    :param V: The edge targets as a NumPy array
+    :param W: The edge weights as a NumPy array
+    :param mst: A list the indices of the tree edges are appended to
+    :param workers: The number of worker processes, None or 1 to scan in this process
+    :return: n/a
+    '''
+    parent = np.frombuffer(Union.Parent, dtype=np.int32)
+    order = np.argsort(W, kind='stable')
+    rank = np.empty(len(W), dtype=np.int64)
+    rank[order] = np.arange(len(W))
+    pool = None
+    blocks = []
+    try:
+        if workers is not None and workers > 1:
+            blocks, specs = share_arrays([U, V, rank, parent])
+            # work on views of the blocks made here rather than attaching a second handle to each of them
+            U, V, rank, component = [np.ndarray(a.shape, dtype=a.dtype, buffer=block.buf)
+                                     for a, block in zip((U, V, rank, parent), blocks)]
+            pool = multiprocessing.Pool(workers, initializer=_init_boruvka_worker, initargs=(specs,))
+            bounds = np.linspace(0, len(W), workers + 1).astype(np.int64).tolist()
+            tasks = list(zip(bounds[:-1], bounds[1:]))
+        else:
+            component = parent.copy()
+        while True:
+            # label every vertex with the root of its component
+            component[...] = parent
+            while True:
+                grandparent = component[component]
+                if (grandparent == component).all():
+                    break
+                component[...] = grandparent
+            if pool is None:
+                ends, ranks = _boruvka_scan(U, V, rank, component)
+            else:
+                parts = pool.map(_boruvka_chunk, tasks)
+                ends, ranks = _lightest_per_component(np.concatenate([part[0] for part in parts]),
+                                                      np.concatenate([part[1] for part in parts]))
+            if len(ends) == 0:
+                break
+            # an edge may be the lightest for both of its components
+            chosen = np.unique(ranks)
+            _kruskal_edges(Union, U, V, order[chosen].tolist(), mst)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        # the views must be dropped before their blocks can be closed
+        U = V = rank = component = ends = ranks = None
+        release_arrays(blocks)
+
+
+def _graph_array(name):
+    '''
+    Makes the property of one of the arrays in GRAPH_CACHE_ARRAYS. The compressed sparse row arrays are patched in
+    place by the updates and only rebuilt when they are read after a row ran out of free slots, the edge arrays are
+    compacted when they are read after edges were removed, so a run of updates pays for at most one of each
+    '''
+    csr = name in ('offsets', 'neighbours', 'weights')
+
+    def get(self):
+        if csr and self.csrStale:
+            self._rebuild_csr()
+        elif not csr and self.dirty:
+            self._rebuild()
+        return self.__dict__['_' + name]
+
+    def set(self, value):
+        self.__dict__['_' + name] = value
+    return property(get, set)
+
+
 class Graph:
     '''
-    This class is used to represent a graph and perform the operations required
+    This class is used to represent a graph and perform the operations required. Edges may be added, removed and
+    reweighted after construction, the minimum spanning tree being kept up to date as they are and the compressed
+    sparse row arrays being patched in place, their rows then ending in free slots which hold self loops of weight 0
     '''
-    def __init__(self, gfile):
+    offsets = _graph_array('offsets')
+    neighbours = _graph_array('neighbours')
+    weights = _graph_array('weights')
+    edgeU = _graph_array('edgeU')
+    edgeV = _graph_array('edgeV')
+    edgeW = _graph_array('edgeW')
+    edgeOrder = _graph_array('edgeOrder')
+
+    def __init__(self, gfile, cache=False):
         '''
-        Constructor for the graph class, The graph is represented as an adjacency matrix
-        Complexity: O(n^2) Where n is the number of nodes in the graph
+        Constructor for the graph class, The graph is represented in compressed sparse row form
+        Complexity: O(V + Elog(E)) Where V is the number of nodes and E is the number of edges in the graph, or O(1)
+        when a valid cache is memory mapped
         :param gfile: a file name to import the graph data from
+        :param cache: True to use the binary cache next to gfile, or the file name of the cache to use. A missing or
+        stale cache is rebuilt from gfile
         '''
-        # Read the data in from the file
-        f = open(gfile, "r")
-        lines = f.readlines()
-        f.close()
-        weights = []
-        # read the lines
-        for i in range(len(lines)):
-            lines[i] = lines[i].replace('\n', '')
-
-        num_nodes = int(lines[0])
-        graph = [[0]*num_nodes for _ in range(num_nodes)]
-        # add the data to the adjacency matrix
-        for i in range(1, len(lines)):
-            line_details = lines[i].split()
-            x = int(line_details[0])
-            y = int(line_details[1])
-            weight = int(line_details[2])
-            graph[x][y] = weight
-            graph[y][x] = weight
-            weights.append([x, y, weight])
-        # store a sorted list of edge weights
-        self.sortedEdges = sorted(weights, key=lambda x: x[2])
+        self.cacheMap = None
+        # the landmarks of build_landmarks and the distance array of each
+        self.landmarks = None
+        self.landmarkDist = None
+        # the state of the dynamic updates, set up by the first update
+        self.dirty = False
+        self.csrStale = False
+        self.rowEnds = None
+        self.removedEdges = set()
+        self.dynamicAdjacency = None
+        self.sortedIndex = None
+        self.mstEdges = None
+        self.mstAdjacency = None
+        # the shortest path trees of distance_matrix
+        self.pathCache = ShortestPathCache()
+        cache_file = None
+        if cache:
+            cache_file = gfile + '.gcache' if cache is True else cache
+            loaded = load_graph_cache(cache_file, gfile)
+            if loaded is not None:
+                # the arrays are zero copy views into the memory mapped cache
+                self.cacheMap, num_nodes, arrays = loaded
+                self.num_nodes = num_nodes
+                for name, typecode in GRAPH_CACHE_ARRAYS:
+                    setattr(self, name, arrays[name])
+                self.adjacencyList = [[] for _ in range(self.num_nodes)]
+                return
+
+        # stream the edges in from the file
+        num_nodes, edgeU, edgeV, edgeW = read_edge_file(gfile)
+        self.num_nodes = num_nodes
+        self.edgeU = edgeU
+        self.edgeV = edgeV
+        self.edgeW = edgeW
+        # store the edge indices sorted by weight
+        self.edgeOrder = array('i', sorted(range(len(edgeW)), key=edgeW.__getitem__))
         # store the graph
-        self.graph = graph
+        self.offsets, self.neighbours, self.weights = build_csr(num_nodes, edgeU, edgeV, edgeW)
+        if cache_file is not None:
+            write_graph_cache(cache_file, gfile, num_nodes, {name: getattr(self, name)
+                                                             for name, typecode in GRAPH_CACHE_ARRAYS})
         # init an adjacency list for storing data in later functions
-        self.adjacencyList = [[] for _ in range(len(self.graph))]
+        self.adjacencyList = [[] for _ in range(self.num_nodes)]
+
+    @property
+    def sortedEdges(self):
+        '''
+        The edges of the graph sorted by weight as [x, y, weight] lists
+        Complexity: O(E) Where E is the number of edges
+        '''
+        return [[self.edgeU[i], self.edgeV[i], self.edgeW[i]] for i in self.edgeOrder]
 
+    @instrumentation.timed('Graph.prims')
     def prims(self, r):
         '''
         This is an implimentation of prims algorithm for finding a spanning tree beginning
-        at node r
-        Complexity: O(n^2) Where n is the number of nodes in the graph
+        at node r. Each vertex is keyed by its depth in the tree so the tree grown is the shallowest one rooted at r
+        Complexity: O((V + E)log(V)) Where V is the number of nodes and E is the number of edges in the graph
         :param r: The node to start the algorithm from
         :return: The maximum depth of the spanning tree rooted at r
         '''
+        offsets = self.offsets
+        neighbours = self.neighbours
         MST = []
-        dist = [math.inf for _ in range(len(self.graph))]
-        parent = [None for _ in range(len(self.graph))]
+        inMST = [False for _ in range(self.num_nodes)]
+        dist = [math.inf for _ in range(self.num_nodes)]
+        parent = [None for _ in range(self.num_nodes)]
         dist[r] = 0
-        Q = PriorityQueue()
-        # insert all edges into a priority queue
-        for x in range(len(self.graph)):
+        Q = make_priority_queue()
+        # insert all vertices into a priority queue
+        for x in range(self.num_nodes):
             Q.insert([x, dist[x]])
         # while the queue is not empty
         while not Q.isEmpty():
-            # pop the smallest edge
+            # pop the closest vertex
             u = Q.pop()
             MST.append(u[0])
-            # iterate over the neighbours of that edge
-            for e in range(len(self.graph[u[0]])):
-                # if it does not produce a cycle
-                if self.graph[u[0]][e] != 0 and e not in MST and dist[e] > 1:
-                    Q.update(e, 1)
+            inMST[u[0]] = True
+            # iterate over the neighbours of that vertex
+            for i in range(offsets[u[0]], offsets[u[0] + 1]):
+                e = neighbours[i]
+                # if it does not produce a cycle and it shortens the depth of e
+                if not inMST[e] and dist[e] > 1 + dist[u[0]]:
                     dist[e] = 1 + dist[u[0]]
+                    Q.update(e, dist[e])
                     parent[e] = u[0]
         # returns the maximum depth of the spanning tree rooted at r
         return max(dist)
 
-    def shallowest_spanning_tree(self):
+    @instrumentation.timed('Graph.shallowest_spanning_tree')
+    def shallowest_spanning_tree(self, workers=None):
         '''
         This function finds and returns the root and depth of the spanning tree with
-        the minimum height from a node.
-        Complexity: O(n^3) Where n is the number of nodes in the tree
+        the minimum height from a node. The shallowest spanning tree rooted at v is the breadth first search tree
+        of v, so the root is the graph center which is found by graph_center
+        Complexity: O(k(V + E)) Where k is the number of breadth first searches graph_center needs, at worst V
+        :param workers: The number of worker processes graph_center may fan the remaining candidates out to
         :return: A tuple containing the root vertex and the height of the tree
         '''
-        # init the nodes
-        Vert = [v for v in range(len(self.graph))]
-        depth = []
-        # for each vertex
-        for v in Vert:
-            # do prims
-            depth.append(self.prims(v))
-            # find the min
-        minVal = min(depth)
-        # find the index
-        minIndex = depth.index(minVal)
-        # return
-        return (Vert[minIndex], minVal)
+        return graph_center(self.offsets, self.neighbours, workers=workers)
+
+    @instrumentation.timed('Graph.minimum_spanning_tree')
+    def minimum_spanning_tree(self, method='kruskal', workers=None):
+        '''
+        This function finds the minimum spanning tree (a forest if the graph is disconnected). The method is one of
+        'kruskal', which runs over the edges in edgeOrder, 'filter' for the NumPy filter kruskal and 'boruvka' for
+        the NumPy boruvka whose scans can be split over workers processes. Without NumPy every method falls back to
+        'kruskal'. Ties are broken by edge index so every method returns the same tree. Once the graph has been
+        updated the tree maintained by the updates is returned whatever the method
+        Complexity: O(Elog(V)) Where E is the number of edges and V is the number of nodes
+        :param method: The algorithm to use
+        :param workers: The number of worker processes used by 'boruvka'
+        :return: A tuple containing the tree edge sources, targets and weights as arrays and the total weight
+        '''
+        if self.mstEdges is not None:
+            # the tree kept up to date by the dynamic updates, in the order kruskal would find it
+            edgeW = self._edgeW
+            mst = sorted(self.mstEdges, key=lambda e: (edgeW[e], e))
+            mstU = array('i', [self._edgeU[i] for i in mst])
+            mstV = array('i', [self._edgeV[i] for i in mst])
+            mstW = array('q', [edgeW[i] for i in mst])
+            return mstU, mstV, mstW, sum(mstW)
+        Union = make_union_find(self.num_nodes)
+        mst = []
+        if np is None or method == 'kruskal':
+            _kruskal_edges(Union, self.edgeU, self.edgeV, self.edgeOrder, mst)
+        else:
+            U = np.frombuffer(self.edgeU, dtype=np.int32)
+            V = np.frombuffer(self.edgeV, dtype=np.int32)
+            W = np.frombuffer(self.edgeW, dtype=np.int64)
+            if method == 'filter':
+                _filter_kruskal(Union, U, V, W, mst)
+            elif method == 'boruvka':
+                _boruvka(Union, U, V, W, mst, workers)
+            else:
+                raise ValueError('unknown minimum spanning tree method %r' % method)
+        mstU = array('i', [self.edgeU[i] for i in mst])
+        mstV = array('i', [self.edgeV[i] for i in mst])
+        mstW = array('q', [self.edgeW[i] for i in mst])
+        return mstU, mstV, mstW, sum(mstW)
+
+    def _start_updates(self):
+        '''
+        This function sets up the state used by the dynamic updates on the first one. The arrays are copied out of
+        a memory mapped cache so they can be changed, every vertex gets a dictionary from the ids of its edges to
+        their other end, the edges are indexed by (weight, id) in a sorted list and the minimum spanning tree is
+        found once by kruskals algorithm. The compressed sparse row arrays are rebuilt with free slots in every row
+        the next time they are read.
+        Complexity: O(V + Elog(E)) Where V is the number of vertices and E is the number of edges
+        '''
+        if self.dynamicAdjacency is not None:
+            return
+        for name, typecode in GRAPH_CACHE_ARRAYS:
+            setattr(self, name, array(typecode, getattr(self, name)))
+        self.cacheMap = None
+        self.csrStale = True
+        edgeU, edgeV, edgeW = self._edgeU, self._edgeV, self._edgeW
+        self.dynamicAdjacency = [{} for _ in range(self.num_nodes)]
+        for e in range(len(edgeU)):
+            self.dynamicAdjacency[edgeU[e]][e] = edgeV[e]
+            self.dynamicAdjacency[edgeV[e]][e] = edgeU[e]
+        self.sortedIndex = [(edgeW[e], e) for e in self._edgeOrder]
+        mst = []
+        _kruskal_edges(UnionFind(self.num_nodes), edgeU, edgeV, self._edgeOrder, mst)
+        self.mstEdges = set()
+        self.mstAdjacency = [{} for _ in range(self.num_nodes)]
+        for e in mst:
+            self._link(e)
+
+    def _rebuild(self):
+        '''
+        This function compacts the edge arrays after updates. Removed edges are dropped and the ids of the others are
+        renumbered in the same order, so ties between equal weights are still broken the same way. The compressed
+        sparse row arrays hold no edge ids so they are left as they are.
+        Complexity: O(V + E) Where V is the number of vertices and E is the number of edges
+        '''
+        self.dirty = False
+        edgeU, edgeV, edgeW = self._edgeU, self._edgeV, self._edgeW
+        if len(self.removedEdges) > 0:
+            renumber = array('i', [-1]) * len(edgeU)
+            kept = [e for e in range(len(edgeU)) if e not in self.removedEdges]
+            for new, e in enumerate(kept):
+                renumber[e] = new
+            edgeU = self._edgeU = array('i', [edgeU[e] for e in kept])
+            edgeV = self._edgeV = array('i', [edgeV[e] for e in kept])
+            edgeW = self._edgeW = array('q', [edgeW[e] for e in kept])
+            self.dynamicAdjacency = [{renumber[e]: v for e, v in edges.items()} for edges in self.dynamicAdjacency]
+            self.sortedIndex = [(w, renumber[e]) for w, e in self.sortedIndex]
+            self.mstEdges = set(renumber[e] for e in self.mstEdges)
+            self.mstAdjacency = [{v: renumber[e] for v, e in edges.items()} for edges in self.mstAdjacency]
+            self.removedEdges = set()
+        self._edgeOrder = array('i', [e for w, e in self.sortedIndex])
+
+    def _rebuild_csr(self):
+        '''
+        This function builds the compressed sparse row arrays again with free slots in every row, on the first read
+        after the updates started and whenever an added edge found a row full
+        Complexity: O(V + E) Where V is the number of vertices and E is the number of edges
+        '''
+        if self.dirty:
+            self._rebuild()
+        self.csrStale = False
+        self._offsets, self._neighbours, self._weights, self.rowEnds = build_slack_csr(
+            self.num_nodes, self._edgeU, self._edgeV, self._edgeW)
+        if instrumentation.active is not None:
+            instrumentation.active.add('Graph.csr_rebuilds')
+
+    def _row_insert(self, u, v, w):
+        '''
+        Puts an edge to v of weight w in the first free slot of the row of u
+        Complexity: O(1)
+        :return: False if the row is full
+        '''
+        end = self.rowEnds[u]
+        if end == self._offsets[u + 1]:
+            return False
+        self._neighbours[end] = v
+        self._weights[end] = w
+        self.rowEnds[u] = end + 1
+        return True
+
+    def _row_delete(self, u, v, w):
+        '''
+        Removes an edge to v of weight w from the row of u, moving the rest of the row down so it stays in edge id
+        order, and frees the last slot
+        Complexity: O(d) Where d is the degree of u
+        '''
+        neighbours, weights = self._neighbours, self._weights
+        end = self.rowEnds[u]
+        for i in range(self._offsets[u], end):
+            if neighbours[i] == v and weights[i] == w:
+                neighbours[i:end - 1] = neighbours[i + 1:end]
+                weights[i:end - 1] = weights[i + 1:end]
+                neighbours[end - 1] = u
+                weights[end - 1] = 0
+                self.rowEnds[u] = end - 1
+                return
+
+    def _row_reweight(self, u, v, old, w):
+        '''
+        Changes the weight of an edge to v from old to w in the row of u
+        Complexity: O(d) Where d is the degree of u
+        '''
+        neighbours, weights = self._neighbours, self._weights
+        for i in range(self._offsets[u], self.rowEnds[u]):
+            if neighbours[i] == v and weights[i] == old:
+                weights[i] = w
+                return
+
+    def _find_edge(self, u, v):
+        '''
+        This function returns the id of the edge between u and v, the lightest one if there are several
+        Complexity: O(d) Where d is the degree of u
+        '''
+        for x in (u, v):
+            if not 0 <= x < self.num_nodes:
+                raise ValueError('vertex %d is not in the graph' % x)
+        edgeW = self._edgeW
+        edges = [e for e, x in self.dynamicAdjacency[u].items() if x == v]
+        if len(edges) == 0:
+            raise ValueError('there is no edge between %d and %d' % (u, v))
+        return min(edges, key=lambda e: (edgeW[e], e))
+
+    def _link(self, e):
+        '''
+        Adds edge e to the minimum spanning tree
+        '''
+        u, v = self._edgeU[e], self._edgeV[e]
+        self.mstEdges.add(e)
+        self.mstAdjacency[u][v] = e
+        self.mstAdjacency[v][u] = e
+
+    def _cut(self, e):
+        '''
+        Removes edge e from the minimum spanning tree
+        '''
+        u, v = self._edgeU[e], self._edgeV[e]
+        self.mstEdges.discard(e)
+        del self.mstAdjacency[u][v]
+        del self.mstAdjacency[v][u]
+
+    def _tree_path(self, u, v):
+        '''
+        This function searches the minimum spanning tree from u for v
+        Complexity: O(V) Where V is the number of vertices in the tree of u
+        :return: The ids of the tree edges on the path from u to v, or None if they are in different trees
+        '''
+        parent = {u: -1}
+        frontier = [u]
+        while len(frontier) > 0 and v not in parent:
+            nextFrontier = []
+            for x in frontier:
+                for y, e in self.mstAdjacency[x].items():
+                    if y not in parent:
+                        parent[y] = e
+                        nextFrontier.append(y)
+            frontier = nextFrontier
+        if v not in parent:
+            return None
+        path = []
+        while v != u:
+            e = parent[v]
+            path.append(e)
+            v = self._edgeU[e] if self._edgeV[e] == v else self._edgeV[e]
+        return path
+
+    def _tree_insert(self, e):
+        '''
+        This function updates the minimum spanning tree for an edge which is new or has become lighter. If its ends
+        are in the same tree it replaces the heaviest edge on the cycle it closes when it is lighter than that edge
+        Complexity: O(V) Where V is the number of vertices in the tree
+        '''
+        u, v = self._edgeU[e], self._edgeV[e]
+        if u == v or e in self.mstEdges:
+            return
+        path = self._tree_path(u, v)
+        if path is None:
+            self._link(e)
+            return
+        edgeW = self._edgeW
+        heaviest = max(path, key=lambda f: (edgeW[f], f))
+        if (edgeW[e], e) < (edgeW[heaviest], heaviest):
+            self._cut(heaviest)
+            self._link(e)
+
+    def _tree_replace(self, e):
+        '''
+        This function updates the minimum spanning tree for a tree edge which is removed or has become heavier. The
+        edge is cut, the smaller of the two trees left is found by searching from both ends in turn, and the
+        lightest edge leaving it, which may be e itself, joins the trees again
+        Complexity: O(S + D) Where S is the number of vertices in the smaller tree and D is the sum of their degrees
+        '''
+        u, v = self._edgeU[e], self._edgeV[e]
+        self._cut(e)
+        # grow both sides a vertex at a time until one runs out
+        sides = ({u}, {v})
+        stacks = ([u], [v])
+        turn = 0
+        while len(stacks[turn]) > 0:
+            x = stacks[turn].pop()
+            for y in self.mstAdjacency[x]:
+                if y not in sides[turn]:
+                    sides[turn].add(y)
+                    stacks[turn].append(y)
+            turn = 1 - turn
+        side = sides[turn]
+        edgeW = self._edgeW
+        best = None
+        for x in side:
+            for f, y in self.dynamicAdjacency[x].items():
+                if y not in side and (best is None or (edgeW[f], f) < (edgeW[best], best)):
+                    best = f
+        if best is not None:
+            self._link(best)
+
+    def add_edge(self, u, v, w):
+        '''
+        This function adds an edge to the graph and updates the minimum spanning tree with a cycle swap. The edge is
+        put in a free slot of the rows of both ends, and if one of them is full the compressed sparse row arrays are
+        rebuilt the next time they are read. Landmarks are dropped as their bounds may no longer hold
+        Complexity: O(V + log(E)) Where V is the number of vertices and E is the number of edges
+        :param u: One end of the edge
+        :param v: The other end of the edge
+        :param w: The weight of the edge
+        :return: n/a
+        '''
+        self._start_updates()
+        for x in (u, v):
+            if not 0 <= x < self.num_nodes:
+                raise ValueError('vertex %d is not in the graph' % x)
+        e = len(self._edgeU)
+        self._edgeU.append(u)
+        self._edgeV.append(v)
+        self._edgeW.append(w)
+        self.dynamicAdjacency[u][e] = v
+        self.dynamicAdjacency[v][e] = u
+        bisect.insort(self.sortedIndex, (w, e))
+        if not self.csrStale and not (self._row_insert(u, v, w) and self._row_insert(v, u, w)):
+            self.csrStale = True
+        self.dirty = True
+        self.pathCache.clear()
+        self.landmarks = self.landmarkDist = None
+        self._tree_insert(e)
+
+    def remove_edge(self, u, v):
+        '''
+        This function removes the edge between u and v, the lightest one if there are several. If it was in the
+        minimum spanning tree the lightest edge joining the two trees left takes its place
+        Complexity: O(S + D + log(E)) Where S and D are as in _tree_replace and E is the number of edges
+        :param u: One end of the edge
+        :param v: The other end of the edge
+        :return: n/a
+        '''
+        self._start_updates()
+        e = self._find_edge(u, v)
+        del self.dynamicAdjacency[u][e]
+        self.dynamicAdjacency[v].pop(e, None)
+        del self.sortedIndex[bisect.bisect_left(self.sortedIndex, (self._edgeW[e], e))]
+        self.removedEdges.add(e)
+        if not self.csrStale:
+            self._row_delete(u, v, self._edgeW[e])
+            self._row_delete(v, u, self._edgeW[e])
+        self.dirty = True
+        self.pathCache.clear()
+        if e in self.mstEdges:
+            self._tree_replace(e)
 
+    def update_weight(self, u, v, w):
+        '''
+        This function changes the weight of the edge between u and v, the lightest one if there are several. A
+        lighter edge outside the tree is handled as an insertion and a heavier tree edge as a removal whose
+        replacement may be the edge itself. Landmarks are dropped when an edge gets lighter
+        Complexity: O(V + D + log(E)) Where V is the number of vertices, D is the sum of the degrees searched by
+        _tree_replace and E is the number of edges
+        :param u: One end of the edge
+        :param v: The other end of the edge
+        :param w: The new weight of the edge
+        :return: n/a
+        '''
+        self._start_updates()
+        e = self._find_edge(u, v)
+        old = self._edgeW[e]
+        del self.sortedIndex[bisect.bisect_left(self.sortedIndex, (old, e))]
+        self._edgeW[e] = w
+        bisect.insort(self.sortedIndex, (w, e))
+        if not self.csrStale:
+            self._row_reweight(u, v, old, w)
+            self._row_reweight(v, u, old, w)
+        self.dirty = True
+        self.pathCache.clear()
+        if w < old:
+            self.landmarks = self.landmarkDist = None
+            self._tree_insert(e)
+        elif w > old and e in self.mstEdges:
+            self._tree_replace(e)
+
+    @instrumentation.timed('Graph.kruskal')
     def kruskal(self):
         '''
         This function is an implementation of kruskals algorithm for finding minimum
-        spanning trees. It utilizes the UnionFind class defined above
+        spanning trees. It utilizes the UnionFind class defined above through minimum_spanning_tree
         Complexity: O(Elog(V)) Where E is the number of edges and V is the number of nodes
         :return: Returns an adjacency list representing the minimum spanning tree
         '''
-
-        Union = UnionFind(len(self.graph))
-        # for each edge in the sorted edges
-        for item in self.sortedEdges:
-            # if it does cause a cycle
-            if Union.find(item[0]) != Union.find(item[1]):
-                # add to the list
-                Union.Union(item[0], item[1])
-                self.adjacencyList[item[0]].append(item[1])
-                self.adjacencyList[item[1]].append(item[0])
+        mstU, mstV, mstW, total = self.minimum_spanning_tree()
+        # rebuild the list so repeated calls give the same tree
+        self.adjacencyList = [[] for _ in range(self.num_nodes)]
+        for x, y in zip(mstU, mstV):
+            self.adjacencyList[x].append(y)
+            self.adjacencyList[y].append(x)
         # return
         return self.adjacencyList
 
 
-    def dijkstra(self, start):
+    @instrumentation.timed('Graph.dijkstra')
+    def dijkstra(self, start, targets=None):
         '''
-        This is an implementation of a modified dijkstra's algorithm that uses an
-        adjacency list to represent the graph. It returns all paths taken and distances to
-        each node from start
+        This is an implementation of dijkstra's algorithm over the compressed sparse row arrays of the graph.
+        It returns the distances to each node from start and the paths taken, which are rebuilt on demand from
+        a predecessor array. If targets is given the search stops as soon as every target has been settled, in which
+        case only the distances of settled vertices are final
         Complexity: O(Elog(V)) Where E is the number of edges and V is the number of vertices
         :param start: The node to start as
+        :param targets: An optional iterable of vertices after which the search can stop
         :return: the distances and paths to each node
         '''
-        # init containers for storing values
-        dist = [math.inf for _ in range(len(self.graph))]
-        dist[start] = 0
-        paths = [[] for _ in range(len(self.graph))]
-        paths[start] = [start]
-        pq = PriorityQueue()
-        pq.insert([start, 0, paths[start]])
-        # while the queue is not empty
-        while not pq.isEmpty():
-            currentVal =  pq.pop()
-            currentDist = currentVal[1]
-            currentNode = currentVal[0]
-            currentPath = currentVal[2]
-
-            # for each neighbour of the current node
-            for neighbour in self.adjacencyList[currentNode]:
-                distance = currentDist + self.graph[currentNode][neighbour]
-                path = currentPath + [neighbour]
-                # if the distance is less than the stored distance
-                if distance < dist[neighbour]:
-                    dist[neighbour] = distance
-                    paths[neighbour] = path
-                    pq.insert([neighbour, distance, path])
-        return dist, paths
+        dist, predecessor = csr_dijkstra(self.offsets, self.neighbours, self.weights, start, targets)
+        return dist, ShortestPaths(predecessor, start)
+
+    def shortest_path_tree(self, source):
+        '''
+        This function returns the shortest path tree of source from the path cache, running dijkstra and caching the
+        tree on a miss
+        Complexity: O(1) for a cached tree, otherwise O(Elog(V)) Where E is the number of edges and V is the number
+        of vertices
+        :param source: The vertex the tree is rooted at
+        :return: A tuple containing the array('q') of distances, -1 for unreached vertices, and the ShortestPaths
+        '''
+        tree = self.pathCache.get(source)
+        if tree is None:
+            dist, predecessor = csr_dijkstra(self.offsets, self.neighbours, self.weights, source)
+            tree = (distance_array(dist), predecessor)
+            self.pathCache.put(source, *tree)
+        return tree[0], ShortestPaths(tree[1], source)
+
+    @instrumentation.timed('Graph.distance_matrix')
+    def distance_matrix(self, sources, targets, workers=None):
+        '''
+        This function returns the distance from each source to each target. The tree of every distinct source is
+        taken from the path cache when it is there, and the searches for the others are run in a process pool of
+        workers processes which attach to the graph arrays in shared memory, then cached. Without NumPy the
+        searches are run in this process.
+        Complexity: O(SElog(V)) Where S is the number of distinct sources which are not cached, E is the number of
+        edges and V is the number of vertices, spread over the workers
+        :param sources: An iterable of source vertices
+        :param targets: An iterable of target vertices
+        :param workers: The number of worker processes, None or 1 to run every search in this process
+        :return: A list holding the list of distances to the targets of each source, inf for unreachable targets
+        '''
+        sources = list(sources)
+        targets = list(targets)
+        trees = {}
+        missing = []
+        for source in dict.fromkeys(sources):
+            tree = self.pathCache.get(source)
+            if tree is None:
+                missing.append(source)
+            else:
+                trees[source] = tree
+        if workers is not None and workers > 1 and np is not None and len(missing) > 1:
+            blocks, specs = share_arrays([np.frombuffer(self.offsets, dtype=np.int64),
+                                          np.frombuffer(self.neighbours, dtype=np.int32),
+                                          np.frombuffer(self.weights, dtype=np.int64)])
+            try:
+                with multiprocessing.Pool(min(workers, len(missing)), initializer=_init_dijkstra_worker,
+                                          initargs=(specs,)) as pool:
+                    found = pool.map(_dijkstra_worker, missing)
+            finally:
+                release_arrays(blocks)
+        else:
+            found = []
+            for source in missing:
+                dist, predecessor = csr_dijkstra(self.offsets, self.neighbours, self.weights, source)
+                found.append((distance_array(dist), predecessor))
+        for source, tree in zip(missing, found):
+            self.pathCache.put(source, *tree)
+            trees[source] = tree
+
+        matrix = []
+        for source in sources:
+            dist = trees[source][0]
+            matrix.append([dist[t] if dist[t] >= 0 else math.inf for t in targets])
+        return matrix
+
+    def build_landmarks(self, k=16, start=0):
+        '''
+        This function picks k landmarks for shortest_path by farthest selection and stores the distances from each
+        of them. The first landmark is the vertex farthest from start and every next one is the vertex farthest from
+        the landmarks chosen so far, a vertex in a component with no landmark counting as the farthest, so the
+        landmarks spread over the edges of the graph where their bounds are tightest.
+        Complexity: O(kElog(V)) Where k is the number of landmarks, E is the number of edges and V is the number of
+        vertices
+        :param k: The number of landmarks
+        :param start: The vertex the selection begins from
+        :return: The array of landmark vertices
+        '''
+        landmarks = array('i')
+        distances = []
+        dist, paths = self.dijkstra(start)
+        closest = [math.inf for _ in range(self.num_nodes)]
+        candidate = max(range(self.num_nodes), key=lambda v: dist[v] if dist[v] < math.inf else -1)
+        for _ in range(min(k, self.num_nodes)):
+            landmarks.append(candidate)
+            dist, paths = self.dijkstra(candidate)
+            distances.append(distance_array(dist))
+            for v in range(self.num_nodes):
+                if dist[v] < closest[v]:
+                    closest[v] = dist[v]
+            candidate = max(range(self.num_nodes), key=closest.__getitem__)
+            # every vertex is a landmark already
+            if closest[candidate] == 0:
+                break
+        self.landmarks = landmarks
+        self.landmarkDist = distances
+        return landmarks
+
+    def save_landmarks(self, landmark_file):
+        '''
+        This function writes the landmarks found by build_landmarks to a file so they can be loaded again with
+        load_landmarks instead of being rebuilt
+        Complexity: O(kV) Where k is the number of landmarks and V is the number of vertices
+        :param landmark_file: The file name to write
+        :return: n/a
+        '''
+        if self.landmarks is None:
+            raise ValueError('build_landmarks must be called before save_landmarks')
+        write_landmarks(landmark_file, self.num_nodes, len(self.edgeU),
+                        graph_fingerprint(self.edgeU, self.edgeV, self.edgeW), self.landmarks, self.landmarkDist)
+
+    def load_landmarks(self, landmark_file):
+        '''
+        This function loads landmarks saved by save_landmarks for this graph, raising ValueError if they were saved
+        for a graph with other edges or weights
+        Complexity: O(kV + E) Where k is the number of landmarks, V is the number of vertices and E is the number of
+        edges
+        :param landmark_file: The file name to read
+        :return: The array of landmark vertices
+        '''
+        self.landmarks, self.landmarkDist = read_landmarks(landmark_file, self.num_nodes, len(self.edgeU),
+                                                           graph_fingerprint(self.edgeU, self.edgeV, self.edgeW))
+        return self.landmarks
+
+    def _landmark_potential(self, source, target):
+        '''
+        This function returns the average potential of a point to point query doubled so it stays an integer, that
+        is the landmark lower bound on the distance to target less the one on the distance from source. Only the
+        landmarks which reach both source and target are used, and potentials are computed when first asked for.
+        :param source: The source of the query
+        :param target: The target of the query
+        :return: A function from a vertex to its doubled potential
+        '''
+        bounds = []
+        if self.landmarkDist is not None:
+            bounds = [(dist, dist[source], dist[target]) for dist in self.landmarkDist
+                      if dist[source] >= 0 and dist[target] >= 0]
+        potentials = {}
 
+        def potential(v):
+            p = potentials.get(v)
+            if p is None:
+                # the triangle inequality bounds through each landmark
+                to_target = max([abs(t - dist[v]) for dist, s, t in bounds] + [0])
+                from_source = max([abs(s - dist[v]) for dist, s, t in bounds] + [0])
+                p = potentials[v] = to_target - from_source
+            return p
+        return potential
+
+    @instrumentation.timed('Graph.shortest_path')
+    def shortest_path(self, source, target):
+        '''
+        This function finds the shortest path between two vertices with a bidirectional A* search guided by the
+        landmarks of build_landmarks (ALT). Both searches use the average of the forward and reverse landmark
+        potentials so they run over the same reduced edge lengths, and the search stops once the smallest keys of
+        the two queues add up to the best path found. Without landmarks it is a bidirectional dijkstra.
+        Complexity: O(Elog(V)) Where E is the number of edges and V is the number of vertices, though only the
+        vertices near the shortest path are usually settled
+        :param source: The vertex to start at
+        :param target: The vertex to reach
+        :return: A tuple containing the distance and the path taken, inf and an empty list if target is unreachable
+        '''
+        if source == target:
+            return (0, [source])
+        offsets = self.offsets
+        neighbours = self.neighbours
+        weights = self.weights
+        potential = self._landmark_potential(source, target)
+        # the forward search keys vertices by 2 * distance + potential and the reverse one by 2 * distance - potential
+        dist = ({source: 0}, {target: 0})
+        predecessor = ({source: -1}, {target: -1})
+        sign = (1, -1)
+        queues = (make_priority_queue(), make_priority_queue())
+        queues[0].insert([source, potential(source)])
+        queues[1].insert([target, -potential(target)])
+        best, meeting = math.inf, -1
+        settled = 0
+        while not queues[0].isEmpty() and not queues[1].isEmpty():
+            if queues[0].queue[0][1] + queues[1].queue[0][1] >= 2 * best:
+                break
+            # grow the smaller frontier
+            side = 0 if len(queues[0]) <= len(queues[1]) else 1
+            currentNode, key = queues[side].pop()
+            settled += 1
+            currentDist = dist[side][currentNode]
+            here, there = dist[side], dist[1 - side]
+            for i in range(offsets[currentNode], offsets[currentNode + 1]):
+                neighbour = neighbours[i]
+                distance = currentDist + weights[i]
+                if distance < here.get(neighbour, math.inf):
+                    here[neighbour] = distance
+                    predecessor[side][neighbour] = currentNode
+                    queues[side].insert([neighbour, 2 * distance + sign[side] * potential(neighbour)])
+                    # a vertex reached from both ends joins a path between them
+                    if neighbour in there and distance + there[neighbour] < best:
+                        best, meeting = distance + there[neighbour], neighbour
+        if instrumentation.active is not None:
+            instrumentation.active.add('shortest_path.settled', settled)
+        if meeting < 0:
+            return (math.inf, [])
+
+        # join the path from source to the meeting vertex with the path from it to target
+        path = []
+        vertex = meeting
+        while vertex >= 0:
+            path.append(vertex)
+            vertex = predecessor[0][vertex]
+        path.reverse()
+        vertex = predecessor[1][meeting]
+        while vertex >= 0:
+            path.append(vertex)
+            vertex = predecessor[1][vertex]
+        return (best, path)
+
+    @instrumentation.timed('Graph.shortest_errand')
     def shortest_errand(self, home, destination, ice_locs, ice_cream_locs):
         '''
         This function finds the shortest path between home and destination that passes through at least one ice_loc then
-        at least one ice_cream_loc.
+        at least one ice_cream_loc. It runs a single dijkstra over (vertex, stage) states where the stage counts the
+        errands done so far, so the optimal choice of ice and ice cream locations is found in one pass.
         Complexity: O(Elog(V)) Where E is the number of edges and V is the number of vertices
         :param home: The home vertex
         :param destination: The destination vertex
         :param ice_locs: The locations of ice
         :param ice_cream_locs: The locations of ice cream
-        :return: A tuple containing the path taken and distance of the route
-        '''
-
-        # run kruskals algorithm on the graph. The result is stored within the class
-        self.kruskal()
-        # run dijkstras algorithm from home
-        distances, paths = self.dijkstra(home)
-
-        # find the most efficient path from home to the ice
-        ice_distance = []
-        for node in ice_locs:
-            ice_distance.append(distances[node])
-        distance_to_ice = min(ice_distance)
-        index_distance_to_ice = ice_distance.index(distance_to_ice)
-        path_to_ice = paths[ice_locs[index_distance_to_ice]]
-
-        # run dijkstras algorithm from the ice location
-        distances, paths = self.dijkstra(path_to_ice[-1])
-        icecream_distance = []
-        # find the most efficient path from ice to the ice cream
-        for node in ice_cream_locs:
-            icecream_distance.append(distances[node])
-
-        distance_to_icecream = min(icecream_distance)
-        index_distance_to_icecream = icecream_distance.index(distance_to_icecream)
-        path_to_icecream = paths[ice_cream_locs[index_distance_to_icecream]]
-        # run dijkstras algorithm from the ice cream location
-        # find the most efficient path from icecream to destination
-        distances, paths = self.dijkstra(path_to_icecream[-1])
-
-        # create the result
-        final_path = path_to_ice + path_to_icecream[1:] + paths[destination][1:]
-        final_distance = distance_to_ice + distance_to_icecream + distances[destination]
-        # return
-        return (final_distance, final_path)
+        :return: A tuple containing the distance and path taken of the route
+        '''
+        search = ErrandSearch(self, [(home, 0)], [ice_locs, ice_cream_locs])
+        final_distance = search.settle(destination)
+        return (final_distance, search.path(destination))
 
+    @instrumentation.timed('Graph.shortest_errands')
+    def shortest_errands(self, queries, ice_locs, ice_cream_locs):
+        '''
+        This function answers shortest_errand for many (home, destination) pairs. Queries are grouped by home, or by
+        destination when there are fewer distinct destinations, and each group is answered by one resumable search
+        whose frontier is reused from one query to the next. Groups are answered one after another so only one
+        search is held in memory at a time. A search from a destination runs over the reversed errand, visiting ice
+        cream locations before ice locations.
+        Complexity: O(KElog(V)) Where K is the number of distinct homes or destinations searched from
+        :param queries: A list of (home, destination) pairs
+        :param ice_locs: The locations of ice
+        :param ice_cream_locs: The locations of ice cream
+        :return: A list holding the (distance, path) tuple of each query in order
+        '''
+        homes = set(home for home, destination in queries)
+        destinations = set(destination for home, destination in queries)
+        reverse = len(destinations) < len(homes)
+        if reverse:
+            checkpoints = [ice_cream_locs, ice_locs]
+        else:
+            checkpoints = [ice_locs, ice_cream_locs]
+        # the indexes of the queries of each source, so only one search is held at a time
+        groups = {}
+        for i, (home, destination) in enumerate(queries):
+            groups.setdefault(destination if reverse else home, []).append(i)
+        results = [None] * len(queries)
+        for source, group in groups.items():
+            search = ErrandSearch(self, [(source, 0)], checkpoints)
+            for i in group:
+                target = queries[i][0] if reverse else queries[i][1]
+                distance = search.settle(target)
+                path = search.path(target)
+                if reverse:
+                    path.reverse()
+                results[i] = (distance, path)
+            # free the search before the next one is built
+            del search
+        return results
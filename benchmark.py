@@ -0,0 +1,213 @@
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import timeit
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# the modules under test, loaded from their files as the names are not importable
+MODULES = {
+    'radix_sort': 'radix_sort.py',
+    'dynamic': 'Recursivity and dynamic programing.py',
+    'graph': 'Tree search algorithms.py',
+}
+
+# a bare run of every suite at these sizes finishes in a few seconds, larger sizes are given with --sizes
+DEFAULT_SIZES = (1000, 10000)
+
+
+def load_module(name):
+    '''
+    This function loads one of the modules in MODULES from the directory of this file. The module is registered in
+    sys.modules so the process pools it starts can pickle its functions.
+    :param name: A key of MODULES
+    :return: The loaded module
+    '''
+    if name in sys.modules:
+        return sys.modules[name]
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), MODULES[name])
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def random_strings(rng, n, alphabet='abcd', length=(4, 12)):
+    '''
+    This function generates n random strings over a small alphabet so that rotations of one another are common
+    :param rng: A seeded random.Random
+    :param n: The number of strings
+    :param alphabet: The characters to use
+    :param length: The smallest and largest string length
+    :return: A list of strings
+    '''
+    return [''.join(rng.choice(alphabet) for _ in range(rng.randint(*length))) for _ in range(n)]
+
+
+def random_graph_file(rng, num_nodes, degree=4, max_weight=1000):
+    '''
+    This function writes a connected random graph in the format read by Graph to a temporary file. A random
+    spanning tree makes it connected and the remaining edges join random pairs of vertices.
+    :param rng: A seeded random.Random
+    :param num_nodes: The number of vertices
+    :param degree: The average degree of the graph
+    :param max_weight: The largest edge weight
+    :return: The name of the file, which the caller removes
+    '''
+    handle, gfile = tempfile.mkstemp(suffix='.graph')
+    with os.fdopen(handle, 'w') as f:
+        f.write('%d\n' % num_nodes)
+        for v in range(1, num_nodes):
+            f.write('%d %d %d\n' % (rng.randrange(v), v, rng.randint(1, max_weight)))
+        for _ in range(max(num_nodes * degree // 2 - (num_nodes - 1), 0)):
+            f.write('%d %d %d\n' % (rng.randrange(num_nodes), rng.randrange(num_nodes), rng.randint(1, max_weight)))
+    return gfile
+
+
+def time_call(function, repeat):
+    '''
+    This function times repeat calls of function
+    :param function: A function taking no arguments
+    :param repeat: The number of calls
+    :return: a list of the times recorded for each call
+    '''
+    times = []
+    for _ in range(repeat):
+        start_time = timeit.default_timer()
+        function()
+        times.append(timeit.default_timer() - start_time)
+    return times
+
+
+def bench_radix_sort(n, rng):
+    '''
+    Times radix_sort on n random 64-bit integers with a fixed and a tuned base
+    '''
+    module = load_module('radix_sort')
+    data = [rng.randint(0, (2 ** 64) - 1) for _ in range(n)]
+    yield 'radix_sort', lambda: module.radix_sort(list(data), 256)
+    yield 'radix_sort_auto', lambda: module.radix_sort(list(data), 'auto')
+
+
+def bench_rotations(n, rng):
+    '''
+    Times radix_sort_rotations and find_rotations on n random short strings
+    '''
+    module = load_module('radix_sort')
+    strings = random_strings(rng, n)
+    yield 'radix_sort_rotations', lambda: module.radix_sort_rotations(strings)
+    yield 'find_rotations', lambda: module.find_rotations(strings, 3)
+
+
+def bench_dynamic(n, rng):
+    '''
+    Times longest_oscillation on n random integers and longest_walk on a random matrix of about n cells
+    '''
+    module = load_module('dynamic')
+    values = [rng.randint(0, 1000) for _ in range(n)]
+    side = max(int(n ** 0.5), 1)
+    matrix = [[rng.randint(0, 1000) for _ in range(side)] for _ in range(side)]
+    yield 'longest_oscillation', lambda: module.longest_oscillation(values)
+    yield 'longest_walk', lambda: module.longest_walk(matrix)
+
+
+def bench_graph(n, rng):
+    '''
+    Times loading a random graph of n vertices and the Graph algorithms on it
+    '''
+    module = load_module('graph')
+    gfile = random_graph_file(rng, n)
+    try:
+        graph = module.Graph(gfile)
+        start, destination = rng.randrange(n), rng.randrange(n)
+        ice_locs = [rng.randrange(n) for _ in range(4)]
+        ice_cream_locs = [rng.randrange(n) for _ in range(4)]
+        yield 'Graph', lambda: module.Graph(gfile)
+        for method in ('kruskal', 'filter', 'boruvka'):
+            yield 'minimum_spanning_tree_' + method, lambda method=method: graph.minimum_spanning_tree(method)
+        yield 'prims', lambda: graph.prims(start)
+        yield 'dijkstra', lambda: graph.dijkstra(start)
+        yield 'shortest_errand', lambda: graph.shortest_errand(start, destination, ice_locs, ice_cream_locs)
+        yield 'shallowest_spanning_tree', lambda: graph.shallowest_spanning_tree()
+    finally:
+        os.remove(gfile)
+
+
+# every suite is a generator of (name, function) pairs for a dataset of size n made from rng
+SUITES = {
+    'radix_sort': bench_radix_sort,
+    'rotations': bench_rotations,
+    'dynamic': bench_dynamic,
+    'graph': bench_graph,
+}
+
+
+def run_benchmarks(suites=None, sizes=DEFAULT_SIZES, repeat=3, seed=0):
+    '''
+    This function runs the benchmark suites on seeded synthetic datasets of each size. Each suite gets its own
+    random.Random seeded from seed and the size so a run can be repeated exactly and compared against another.
+    :param suites: The names of the suites in SUITES to run, by default all of them
+    :param sizes: The dataset sizes
+    :param repeat: The number of times each function is timed
+    :param seed: The seed of the datasets
+    :return: A dictionary of the run settings and a list of results, each holding the suite, function name, size,
+    every time recorded and the best of them in seconds
+    '''
+    if suites is None:
+        suites = list(SUITES)
+    results = []
+    for suite in suites:
+        for n in sizes:
+            rng = random.Random('%s-%d-%d' % (suite, seed, n))
+            for name, function in SUITES[suite](n, rng):
+                times = time_call(function, repeat)
+                results.append({'suite': suite, 'name': name, 'size': n, 'times': times, 'best': min(times)})
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__ if np is not None else None,
+        'seed': seed,
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def main(argv=None):
+    '''
+    The command line entry point of the benchmarks
+    :param argv: The arguments, by default sys.argv[1:]
+    '''
+    parser = argparse.ArgumentParser(description='Time the algorithms of this repo on seeded synthetic data and '
+                                                 'print the results as JSON.')
+    parser.add_argument('suites', nargs='*', help='the suites to run out of %s, by default all of them'
+                                                  % ', '.join(SUITES))
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help='the dataset sizes')
+    parser.add_argument('--repeat', type=int, default=3, help='the number of times each function is timed')
+    parser.add_argument('--seed', type=int, default=0, help='the seed of the datasets')
+    parser.add_argument('--output', help='the file to write the JSON to, by default standard output')
+    args = parser.parse_args(argv)
+    for suite in args.suites:
+        if suite not in SUITES:
+            parser.error('unknown suite %r' % suite)
+
+    report = run_benchmarks(args.suites or None, args.sizes, args.repeat, args.seed)
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
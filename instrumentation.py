@@ -0,0 +1,169 @@
+import collections
+import contextlib
+import functools
+import timeit
+
+
+# the Recorder counts are sent to, None while nothing is being recorded. Hot paths read it once per call and take
+# their counting path only when it is set, so the instrumentation costs nothing when it is disabled
+active = None
+
+
+class Recorder:
+    '''
+    This class collects operation counters and phase timings while it is active. Counters are named
+    '<function>.<operation>', such as 'dijkstra.relaxations' or 'UnionFind.find_hops', and phases are named after the
+    function they time. Work done in worker processes of a pool is not recorded.
+    '''
+    def __init__(self):
+        '''
+        Constructor
+        Complexity: O(1)
+        '''
+        self.counters = collections.Counter()
+        self.phases = collections.defaultdict(lambda: [0, 0.0])
+
+    def add(self, name, n=1):
+        '''
+        This function adds n to a counter
+        Complexity: O(1)
+        :param name: The name of the counter
+        :param n: The amount to add
+        :return: n/a
+        '''
+        self.counters[name] += n
+
+    def maximum(self, name, n):
+        '''
+        This function raises a counter to n if it is smaller, for sizes such as the largest counting table
+        Complexity: O(1)
+        :param name: The name of the counter
+        :param n: The value seen
+        :return: n/a
+        '''
+        if n > self.counters[name]:
+            self.counters[name] = n
+
+    def time(self, name, seconds):
+        '''
+        This function adds a timed run of a phase
+        Complexity: O(1)
+        :param name: The name of the phase
+        :param seconds: The time it took
+        :return: n/a
+        '''
+        phase = self.phases[name]
+        phase[0] += 1
+        phase[1] += seconds
+
+    def merge(self, other):
+        '''
+        This function adds the counters and timings of another recorder to this one
+        Complexity: O(k) where k is the number of counters and phases of other
+        :param other: A Recorder
+        :return: n/a
+        '''
+        for name, n in other.counters.items():
+            if name.endswith('_max'):
+                self.maximum(name, n)
+            else:
+                self.add(name, n)
+        for name, (calls, seconds) in other.phases.items():
+            phase = self.phases[name]
+            phase[0] += calls
+            phase[1] += seconds
+
+    def snapshot(self):
+        '''
+        This function returns the recorded values as plain dictionaries, ready to be exported as JSON or to a
+        metrics pipeline
+        Complexity: O(k) where k is the number of counters and phases
+        :return: A dictionary with the counters and the number of calls and total seconds of each phase
+        '''
+        return {
+            'counters': dict(self.counters),
+            'phases': {name: {'calls': calls, 'seconds': seconds} for name, (calls, seconds) in self.phases.items()},
+        }
+
+
+@contextlib.contextmanager
+def record(callback=None):
+    '''
+    This function is a context manager which records the instrumented calls made inside it. Recordings may be
+    nested, the inner one is active while it runs and its values are added to the outer one when it ends.
+    Complexity: O(1) plus the cost of the callback
+    :param callback: An optional function called with the snapshot of the Recorder when the block ends
+    :return: The Recorder, from the with statement
+    '''
+    global active
+    outer = active
+    recorder = Recorder()
+    active = recorder
+    try:
+        yield recorder
+    finally:
+        active = outer
+        if outer is not None:
+            outer.merge(recorder)
+        if callback is not None:
+            callback(recorder.snapshot())
+
+
+def current():
+    '''
+    :return: The active Recorder, or None if nothing is being recorded
+    '''
+    return active
+
+
+class _Phase:
+    '''
+    Times the block it is entered for into the Recorder active when it started
+    '''
+    __slots__ = ('name', 'recorder', 'start_time')
+
+    def __init__(self, name, recorder):
+        self.name = name
+        self.recorder = recorder
+
+    def __enter__(self):
+        self.start_time = timeit.default_timer()
+        return self
+
+    def __exit__(self, *exc):
+        self.recorder.time(self.name, timeit.default_timer() - self.start_time)
+        return False
+
+
+_no_phase = contextlib.nullcontext()
+
+
+def phase(name):
+    '''
+    This function returns a context manager timing a phase into the active Recorder, or a shared one which does
+    nothing when nothing is being recorded
+    Complexity: O(1)
+    :param name: The name of the phase
+    :return: A context manager
+    '''
+    if active is None:
+        return _no_phase
+    return _Phase(name, active)
+
+
+def timed(name):
+    '''
+    This function is a decorator timing every call of the decorated function as a phase. When nothing is being
+    recorded the call goes straight through
+    :param name: The name of the phase
+    :return: The decorator
+    '''
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if active is None:
+                return function(*args, **kwargs)
+            with _Phase(name, active):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -1,16 +1,52 @@
+import collections
+import json
+import mmap
+import multiprocessing
+import os
+import shutil
+import tempfile
 import timeit
 import random
+from array import array
+from multiprocessing import shared_memory
+
+import instrumentation
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# counting tables longer than this many times the input are replaced by a table of the distinct keys only
+SPARSE_COUNTING_FACTOR = 4
 
 
 def counting_sort_partial(array):
     '''
     This function is an adaptation of counting sort which instead of returning a sorted array
-    it returns the position array.
-    Complexity: O(n + m) where n is the length of the input array and m is the maximum element in the array
+    it returns the position array. When the maximum element is much larger than the length of the array the
+    counts are kept in a hash histogram of the distinct elements instead, which are sorted and ranked so the
+    position table only holds the elements that occur.
+    Complexity: O(n + m) where n is the length of the input array and m is the maximum element in the array, or
+    O(n + klog(k)) where k is the number of distinct elements when m is more than SPARSE_COUNTING_FACTOR * n
     :param array: The input array for which the position array is returned
-    :return: The position array containing the position of each element
+    :return: The position array containing the position of each element, a dictionary from each element to its
+    position when the elements are sparse
     '''
     maxElement = max(array)
+    recorder = instrumentation.active
+    if maxElement + 1 > SPARSE_COUNTING_FACTOR * len(array):
+        position = sparse_counting_sort_partial(array)
+        if recorder is not None:
+            recorder.add('counting_sort.sparse_tables')
+            recorder.add('counting_sort.table_entries', len(position))
+            recorder.maximum('counting_sort.table_size_max', len(position))
+        return position
+    if recorder is not None:
+        recorder.add('counting_sort.tables')
+        recorder.add('counting_sort.table_entries', maxElement + 1)
+        recorder.maximum('counting_sort.table_size_max', maxElement + 1)
     countElements = [0] * (maxElement+1)
     position = [0] * (maxElement+1)
 
@@ -25,6 +61,24 @@ def counting_sort_partial(array):
     return position
 
 
+def sparse_counting_sort_partial(array):
+    '''
+    This function returns the same positions as counting_sort_partial using a hash histogram, so its memory does not
+    depend on the size of the largest element
+    Complexity: O(n + klog(k)) where n is the length of the input array and k is the number of distinct elements
+    :param array: The input array for which the positions are returned
+    :return: A dictionary mapping each distinct element to its position
+    '''
+    countElements = collections.Counter(array)
+    position = {}
+    total = 0
+    # rank the distinct elements in order
+    for element in sorted(countElements):
+        position[element] = total
+        total += countElements[element]
+    return position
+
+
 def digits_in_base(number, base):
     '''
     This function returns the number of digits in an integer represented in base
@@ -39,26 +93,38 @@ def digits_in_base(number, base):
         remainder = remainder // base
     return number_of_digits
 
+@instrumentation.timed('radix_sort')
 def radix_sort(list, base):
     '''
     This is an implementation of radix sort which uses the counting_sort_partial adaptation to sort elements by the nth
     digit in the specified base.
     Complexity: O((n + b)M) where n is the total number of integers in the input, b is the base and M is the number of
     digits in the maximum number represented in base b
-    :param list: A list of integers to be sorted
-    :param base: A base to represent each number in to sort each digit by
-    :return: a sorted list of integers
+    :param list: A list of integers to be sorted, or a NumPy integer array or array.array
+    :param base: A base to represent each number in to sort each digit by, or "auto" to let choose_radix_base pick
+    one from the tuning profile
+    :return: a sorted list of integers, or a sorted array of the same type when list is a NumPy array or array.array
     '''
 
     # If the list is empty return the list
     if len(list) == 0:
         return list
 
+    if base == 'auto':
+        base = choose_radix_base(list)
+
+    # typed buffers of fixed width integers are sorted by the vectorized engine when the base is a power of 2 it
+    # supports, larger bases are left to the loops below
+    if np is not None and isinstance(list, (np.ndarray, array)) and 2 <= base <= 1 << 16 and base & (base - 1) == 0:
+        return radix_sort_array(list, base)
+
     # setup the variables used in radix sort
     output = [0]*len(list)
     temp = [0]*len(list)
     max_number = max(list)
     max_number_length = digits_in_base(max_number, base)
+    if instrumentation.active is not None:
+        instrumentation.active.add('radix_sort.passes', max_number_length)
     list_copy = []
 
     # create a copy of the input so it remains unaffected
@@ -84,10 +150,514 @@ def radix_sort(list, base):
         for i in range(len(output)):
             list_copy[i] = output[i]
 
+    # typed buffers get a buffer of the same type back whichever engine sorted them
+    if isinstance(list, array):
+        return array(list.typecode, output)
+    if np is not None and isinstance(list, np.ndarray):
+        return np.array(output, dtype=list.dtype)
     # return the output
     return output
 
 
+@instrumentation.timed('radix_argsort')
+def radix_argsort(keys, base=256, order=None):
+    '''
+    This is an adaptation of radix sort which uses the counting_sort_partial adaptation to find the stable permutation
+    which sorts keys rather than the sorted keys themselves. Keys are offset by the minimum key so negative keys are
+    allowed. If order is given the indices in order are sorted instead of range(len(keys)), which lets passes over
+    several keys be chained into a lexicographic sort.
+    Complexity: O((n + b)M) where n is the number of keys, b is the base and M is the number of digits in the
+    range of the keys represented in base b
+    :param keys: A sequence of integers
+    :param base: A base to represent each key in to sort each digit by
+    :param order: An optional sequence of indices into keys giving the order before this sort
+    :return: an array of indices such that [keys[i] for i in result] is sorted and equal keys keep their order
+    '''
+    typecode = 'i' if len(keys) < 2 ** 31 else 'q'
+    perm = array(typecode, range(len(keys)) if order is None else order)
+    if len(keys) == 0:
+        return perm
+
+    # offset the keys once so every key is a non-negative integer
+    minimum = min(keys)
+    shifted = [key - minimum for key in keys]
+    output = array(typecode, perm)
+    divisor = 1
+    passes = digits_in_base(max(shifted), base)
+    if instrumentation.active is not None:
+        instrumentation.active.add('radix_argsort.passes', passes)
+    for d in range(passes):
+        # the d-th digit of each key in the current order
+        temp = [shifted[i] // divisor % base for i in perm]
+        position = counting_sort_partial(temp)
+
+        # move each index depending on the position array
+        for j in range(len(temp)):
+            output[position[temp[j]]] = perm[j]
+            position[temp[j]] += 1
+        perm, output = output, perm
+        divisor *= base
+    return perm
+
+
+def sort_by_key(records, key, base=256):
+    '''
+    This function stably sorts records by an integer key using radix_argsort, so each key is extracted once and no
+    comparisons are made. If key is a list of functions the records are sorted lexicographically, the first function
+    being the most significant, by chaining one radix_argsort per key from the least significant one.
+    Complexity: O(K(n + b)M) where K is the number of key functions and n, b and M are as in radix_argsort
+    :param records: A sequence of records
+    :param key: A function mapping a record to an integer, or a list of such functions
+    :param base: A base to represent each key in to sort each digit by
+    :return: a sorted list of the records
+    '''
+    keys = key if isinstance(key, (list, tuple)) else [key]
+    perm = None
+    for function in reversed(keys):
+        perm = radix_argsort([function(record) for record in records], base, perm)
+    if perm is None:
+        return [record for record in records]
+    return [records[i] for i in perm]
+
+
+@instrumentation.timed('radix_sort_array')
+def radix_sort_array(keys, base=256):
+    '''
+    This is a vectorized implementation of radix sort for NumPy integer arrays and array buffers. The base must be a
+    power of 2 so the d-th digit is extracted with a shift and a mask. Each pass counts the digits with bincount,
+    skips the pass if every key has the same digit and otherwise scatters the keys stably into a second buffer by
+    their digit, the two buffers swapping roles after every pass so nothing is copied back. Signed keys are biased
+    by flipping their sign bit so they sort as unsigned keys.
+    Complexity: O((n + b)M) where n is the number of keys, b is the base and M is the number of digits in the
+    maximum key represented in base b
+    :param keys: A NumPy integer array or an array.array of integers
+    :param base: A power of 2 to represent each key in, at most 2**16
+    :return: a sorted array of the same type as keys
+    '''
+    if np is None:
+        raise ImportError('radix_sort_array requires numpy')
+    if base < 2 or base > 1 << 16 or base & (base - 1) != 0:
+        raise ValueError('base must be a power of 2 between 2 and 2**16')
+    values = np.asarray(keys)
+    if values.dtype.kind not in 'iu':
+        raise TypeError('radix_sort_array sorts integer arrays, not %s' % values.dtype)
+    if len(values) == 0:
+        return keys[:0]
+
+    src, bias = _biased_keys(values)
+    src = _lsd_radix_passes(src, np.empty_like(src), base)
+    return _unbiased_keys(src, bias, keys)
+
+
+def _biased_keys(values):
+    '''
+    Copies an integer array into an unsigned array of the same width, flipping the sign bit of signed keys so the
+    unsigned order matches the signed order
+    :return: A tuple of the unsigned copy and the bias which was xored in, 0 for unsigned keys
+    '''
+    unsigned = values.dtype.newbyteorder('=').str.replace('i', 'u')
+    src = values.astype(unsigned)
+    bias = 0
+    if values.dtype.kind == 'i':
+        bias = 1 << (8 * values.dtype.itemsize - 1)
+        src ^= np.array(bias, dtype=unsigned)
+    return src, bias
+
+
+def _unbiased_keys(src, bias, keys):
+    '''
+    Undoes _biased_keys on the sorted unsigned keys and returns them in the type of the original keys
+    '''
+    values = np.asarray(keys)
+    if bias:
+        src ^= np.array(bias, dtype=src.dtype)
+    result = src.astype(values.dtype)
+    if isinstance(keys, array):
+        return array(keys.typecode, result.tobytes())
+    return result
+
+
+def _lsd_radix_passes(src, dst, base):
+    '''
+    Runs the digit passes of radix_sort_array over the unsigned keys in src using dst as the second buffer
+    :return: The buffer, src or dst, which holds the sorted keys
+    '''
+    unsigned = src.dtype
+    bits = base.bit_length() - 1
+    mask = np.array((base - 1) & np.iinfo(unsigned).max, dtype=unsigned)
+    digit_type = np.uint8 if bits <= 8 else np.uint16
+    max_bits = int(src.max()).bit_length() if len(src) > 0 else 0
+    recorder = instrumentation.active
+    for shift in range(0, max_bits, bits):
+        digits = ((src >> np.array(shift, dtype=unsigned)) & mask).astype(digit_type)
+        counts = np.bincount(digits, minlength=base)
+        if recorder is not None:
+            recorder.add('radix_sort_array.passes')
+            recorder.add('radix_sort_array.table_entries', base)
+            recorder.maximum('radix_sort_array.table_size_max', base)
+        # a pass where every key has the same digit leaves the order unchanged
+        if counts.max() == len(src):
+            if recorder is not None:
+                recorder.add('radix_sort_array.skipped_passes')
+            continue
+        # a stable argsort of 8 or 16 bit digits is a counting sort within numpy
+        np.take(src, np.argsort(digits, kind='stable'), out=dst)
+        src, dst = dst, src
+    return src
+
+
+RADIX_PROFILE_FILE = os.path.join(os.path.expanduser('~'), '.cache', 'radix_sort_profile.json')
+RADIX_PROFILE_VERSION = 2
+# seconds per key per pass and per counting table entry per pass for each engine, and for the list engine the extra
+# seconds per key of a pass whose table is sparse, used until a profile is calibrated
+DEFAULT_RADIX_PROFILE = {'version': RADIX_PROFILE_VERSION,
+                         'list': {'key': 5e-7, 'bucket': 1.2e-7, 'sparse': 6e-7},
+                         'array': {'key': 1.5e-8, 'bucket': 3e-9}}
+_radix_profile = None
+
+
+def measure_radix_pass(engine, n, base, repeat=3):
+    '''
+    This function times a single digit pass of radix sort on n random keys
+    :param engine: 'list' for radix_sort on a Python list or 'array' for radix_sort_array
+    :param n: The number of keys
+    :param base: The base of the pass, a power of 2
+    :param repeat: The number of timings, the fastest is kept
+    :return: The time of one pass in seconds
+    '''
+    rng = random.Random(n ^ base)
+    if engine == 'list':
+        data = [rng.randrange(base) for _ in range(n)]
+    else:
+        data = np.array([rng.randrange(base) for _ in range(n)], dtype=np.uint64)
+        # keep a set top bit so the array engine does not skip the pass
+        data[0] = base - 1
+    best = None
+    for _ in range(repeat):
+        start_time = timeit.default_timer()
+        if engine == 'list':
+            radix_sort(data, base)
+        else:
+            radix_sort_array(data, base)
+        elapsed = timeit.default_timer() - start_time
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def calibrate_radix_sort(profile_file=RADIX_PROFILE_FILE, n=20000):
+    '''
+    This function measures the cost of a radix sort pass on this machine and saves it as the tuning profile used by
+    base="auto". For each engine the cost of a pass is modelled as key * n + bucket * b, key is measured from a pass
+    over n keys with a small base and bucket from a pass with a large base. The list engine counts a pass in a hash
+    histogram once b is more than SPARSE_COUNTING_FACTOR * n, so its bucket cost is measured with the largest base
+    which still gets a counting table and the cost of a sparse pass is modelled as (key + sparse) * n.
+    :param profile_file: The file the profile is saved to, None to only keep it in memory
+    :param n: The number of keys used to measure the per key cost
+    :return: The profile as a dictionary
+    '''
+    global _radix_profile
+    profile = {'version': RADIX_PROFILE_VERSION}
+    engines = ['list'] if np is None else ['list', 'array']
+    for engine in engines:
+        key = measure_radix_pass(engine, n, 16) / n
+        if engine == 'list':
+            # the largest power of 2 base whose digits are still counted in a table
+            big_base = 1 << (SPARSE_COUNTING_FACTOR * n).bit_length() - 1
+            bucket = max(measure_radix_pass(engine, n, big_base) - n * key, 0) / big_base
+            sparse = max(measure_radix_pass(engine, n, big_base << 4) - n * key, 0) / n
+            profile[engine] = {'key': key, 'bucket': bucket, 'sparse': sparse}
+        else:
+            big_base = 1 << 16
+            bucket = max(measure_radix_pass(engine, 16, big_base) - 16 * key, 0) / big_base
+            profile[engine] = {'key': key, 'bucket': bucket}
+    if 'array' not in profile:
+        profile['array'] = DEFAULT_RADIX_PROFILE['array']
+    if profile_file is not None:
+        os.makedirs(os.path.dirname(os.path.abspath(profile_file)), exist_ok=True)
+        with open(profile_file, 'w') as f:
+            json.dump(profile, f, indent=2)
+    _radix_profile = profile
+    return profile
+
+
+def load_radix_profile(profile_file=RADIX_PROFILE_FILE):
+    '''
+    This function returns the tuning profile. The profile of the default file is read the first time and kept, the
+    last calibrate_radix_sort replacing it, and any other file is read on every call. A missing, unreadable or
+    outdated file gives DEFAULT_RADIX_PROFILE
+    :param profile_file: The file the profile was saved to by calibrate_radix_sort
+    :return: The profile as a dictionary
+    '''
+    global _radix_profile
+    if profile_file == RADIX_PROFILE_FILE and _radix_profile is not None:
+        return _radix_profile
+    try:
+        with open(profile_file) as f:
+            profile = json.load(f)
+    except (OSError, ValueError):
+        profile = None
+    if profile is None or profile.get('version') != RADIX_PROFILE_VERSION:
+        profile = DEFAULT_RADIX_PROFILE
+    if profile_file == RADIX_PROFILE_FILE:
+        _radix_profile = profile
+    return profile
+
+
+def choose_radix_base(keys, profile=None):
+    '''
+    This function picks the power of 2 base which minimises the modelled cost of sorting keys, that is the number of
+    passes times the cost of a pass, key * n + bucket * b, from the tuning profile. Small bases need many passes and
+    large bases allocate large counting tables, the cost model finds the point between them for the input length
+    and key width. A list pass whose base is more than SPARSE_COUNTING_FACTOR * n counts in a hash histogram
+    instead and costs (key + sparse) * n.
+    :param keys: The keys which will be sorted, a list, array.array or NumPy array
+    :param profile: A profile as returned by calibrate_radix_sort, by default the one from load_radix_profile
+    :return: The chosen base
+    '''
+    if profile is None:
+        profile = load_radix_profile()
+    if np is not None and isinstance(keys, (np.ndarray, array)):
+        cost = profile['array']
+        values = np.asarray(keys)
+        if values.dtype.kind == 'i':
+            # signed keys are biased so every bit can take part
+            key_bits = 8 * values.dtype.itemsize
+        else:
+            key_bits = int(values.max()).bit_length()
+        max_bits = 16
+    else:
+        cost = profile['list']
+        key_bits = max(keys).bit_length()
+        max_bits = 24
+    n = len(keys)
+    best = None
+    for bits in range(1, max_bits + 1):
+        passes = max(-(-key_bits // bits), 1)
+        if 'sparse' in cost and 1 << bits > SPARSE_COUNTING_FACTOR * n:
+            total = passes * (cost['key'] + cost['sparse']) * n
+        else:
+            total = passes * (cost['key'] * n + cost['bucket'] * (1 << bits))
+        if best is None or total < best[0]:
+            best = (total, 1 << bits)
+    return best[1]
+
+
+_shared_keys = None
+
+
+def _init_radix_worker(specs):
+    '''
+    Pool initializer which attaches each worker to the shared key buffers of parallel_radix_sort
+    '''
+    global _shared_keys
+    _shared_keys = []
+    for name, dtype, length in specs:
+        block = shared_memory.SharedMemory(name=name)
+        _shared_keys.append((block, np.ndarray(length, dtype=dtype, buffer=block.buf)))
+
+
+def _msd_histogram(task):
+    '''
+    Counts the top digits of the keys [start, stop) of the shared input buffer
+    '''
+    start, stop, shift, buckets = task
+    keys = _shared_keys[0][1][start:stop]
+    return np.bincount((keys >> np.array(shift, dtype=keys.dtype)).astype(np.int64), minlength=buckets)
+
+
+def _msd_scatter(task):
+    '''
+    Moves the keys [start, stop) of the shared input buffer to their buckets in the shared output buffer. The keys
+    of each bucket are written from that chunk's offset in the bucket, so the scatter is stable
+    '''
+    start, stop, shift, offsets = task
+    keys = _shared_keys[0][1][start:stop]
+    out = _shared_keys[1][1]
+    digits = (keys >> np.array(shift, dtype=keys.dtype)).astype(np.int64)
+    order = np.argsort(digits, kind='stable')
+    digits = digits[order]
+    # rank of each key within its bucket in this chunk
+    first = np.searchsorted(digits, digits, side='left')
+    out[np.asarray(offsets)[digits] + np.arange(len(digits)) - first] = keys[order]
+
+
+def _lsd_bucket(task):
+    '''
+    Sorts the range [start, stop) of the shared output buffer in place with the LSD digit passes
+    '''
+    start, stop, base = task
+    keys = _shared_keys[1][1][start:stop]
+    result = _lsd_radix_passes(keys, np.empty_like(keys), base)
+    if result is not keys:
+        keys[...] = result
+
+
+@instrumentation.timed('parallel_radix_sort')
+def parallel_radix_sort(keys, workers=None, base=256, msd_bits=8):
+    '''
+    This is a parallel radix sort for large NumPy integer arrays and array buffers. One MSD pass splits the keys
+    into 2**msd_bits buckets by their top bits, each worker counting the top digits of its own chunk of the input
+    so the chunks can be scattered stably and in parallel, then every bucket is sorted with the LSD passes of
+    radix_sort_array. The workers share the key buffers through shared memory. The result is identical to
+    radix_sort_array and without NumPy the serial radix_sort is used.
+    Complexity: O((n + b)M / p) where n is the number of keys, b is the base, M is the number of digits of the
+    largest key and p is the number of workers
+    :param keys: A NumPy integer array or an array.array of integers
+    :param workers: The number of worker processes, by default the number of cpus
+    :param base: A power of 2 used by the LSD passes on each bucket
+    :param msd_bits: The number of top bits which pick the bucket of each key
+    :return: a sorted array of the same type as keys
+    '''
+    if np is None:
+        return radix_sort(keys, base)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    values = np.asarray(keys)
+    if values.dtype.kind not in 'iu':
+        raise TypeError('parallel_radix_sort sorts integer arrays, not %s' % values.dtype)
+    if len(values) == 0:
+        return keys[:0]
+
+    src, bias = _biased_keys(values)
+    max_bits = int(src.max()).bit_length()
+    shift = max(max_bits - msd_bits, 0)
+    buckets = 1 << min(msd_bits, max_bits)
+    blocks = []
+    try:
+        specs = []
+        for data in (src, None):
+            block = shared_memory.SharedMemory(create=True, size=max(src.nbytes, 1))
+            blocks.append(block)
+            if data is not None:
+                np.ndarray(len(src), dtype=src.dtype, buffer=block.buf)[...] = data
+            specs.append((block.name, src.dtype.str, len(src)))
+        with multiprocessing.Pool(workers, initializer=_init_radix_worker, initargs=(specs,)) as pool:
+            bounds = np.linspace(0, len(src), workers + 1).astype(np.int64).tolist()
+            chunks = list(zip(bounds[:-1], bounds[1:]))
+            # per chunk histograms give each chunk its own offset inside every bucket
+            counts = np.array(pool.map(_msd_histogram, [(start, stop, shift, buckets) for start, stop in chunks]))
+            totals = counts.sum(axis=0)
+            bucket_starts = np.concatenate(([0], np.cumsum(totals)[:-1]))
+            offsets = bucket_starts + np.cumsum(counts, axis=0) - counts
+            pool.map(_msd_scatter, [(start, stop, shift, offsets[c].tolist())
+                                    for c, (start, stop) in enumerate(chunks)])
+            # sort the largest buckets first so the pool stays balanced
+            tasks = [(int(bucket_starts[b]), int(bucket_starts[b] + totals[b]), base)
+                     for b in np.argsort(-totals, kind='stable') if totals[b] > 1]
+            pool.map(_lsd_bucket, tasks, chunksize=1)
+        result = np.ndarray(len(src), dtype=src.dtype, buffer=blocks[1].buf).copy()
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+    return _unbiased_keys(result, bias, keys)
+
+
+@instrumentation.timed('external_radix_sort')
+def external_radix_sort(in_file, out_file, key_size=8, signed=False, memory_limit=1 << 26, temp_dir=None):
+    '''
+    This is an out of core radix sort for files of fixed width little endian integer keys which are larger than
+    memory. The keys are streamed through a memory map in chunks and distributed by their top byte into 256
+    bucket files, each bucket which fits in memory_limit is sorted with radix_sort_array and written into a memory
+    map of the output file and a bucket which is still too large is distributed again by its next byte.
+    Complexity: O(nk) where n is the number of keys and k is the key size in bytes, with at most k passes over
+    the data on disk and O(memory_limit) memory
+    :param in_file: The file of keys to sort
+    :param out_file: The file the sorted keys are written to
+    :param key_size: The width of each key in bytes, 1, 2, 4 or 8
+    :param signed: True if the keys are two's complement signed integers
+    :param memory_limit: The number of bytes of keys and working buffers which may be held in memory at once
+    :param temp_dir: The directory the bucket files are made in, by default the system temporary directory
+    :return: The number of keys sorted
+    '''
+    if np is None:
+        raise ImportError('external_radix_sort requires numpy')
+    dtype = np.dtype('<%s%d' % ('i' if signed else 'u', key_size))
+    count = os.path.getsize(in_file) // key_size
+    # bytes held per key at the peak of sorting a chunk with radix_sort_array: the chunk, its unsigned copy, the
+    # second buffer and a shifted temporary of key_size bytes each, the digits and the int64 argsort index with its
+    # workspace of about 24 bytes. Distributing a chunk into buckets holds less
+    chunk_keys = max(memory_limit // (4 * key_size + 24), 1)
+    with open(out_file, 'wb') as f:
+        f.truncate(count * key_size)
+    if count == 0:
+        return 0
+    work_dir = tempfile.mkdtemp(prefix='radix_sort_', dir=temp_dir)
+    try:
+        with open(out_file, 'r+b') as f:
+            out = mmap.mmap(f.fileno(), count * key_size)
+            try:
+                _external_sort_range(in_file, count, dtype, out, 0, 8 * (key_size - 1), chunk_keys, work_dir)
+                out.flush()
+            finally:
+                out.close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return count
+
+
+def _read_key_chunks(path, count, dtype, chunk_keys):
+    '''
+    Yields copies of the keys of a file chunk_keys at a time through a memory map
+    '''
+    if count == 0:
+        return
+    with open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            for start in range(0, count, chunk_keys):
+                stop = min(start + chunk_keys, count)
+                yield np.frombuffer(mm, dtype=dtype, count=stop - start, offset=start * dtype.itemsize).copy()
+        finally:
+            mm.close()
+
+
+def _external_sort_range(path, count, dtype, out, position, shift, chunk_keys, work_dir):
+    '''
+    Sorts the count keys of the file path into the output memory map starting at key position. Keys which fit in
+    memory are sorted directly, otherwise they are distributed into bucket files by the byte at shift and every
+    bucket is sorted recursively in order.
+    '''
+    size = dtype.itemsize
+    if count <= chunk_keys or shift < 0:
+        # a range that is still too large once every byte is used holds a single repeated key
+        for chunk in _read_key_chunks(path, count, dtype, chunk_keys):
+            if count <= chunk_keys:
+                chunk = radix_sort_array(chunk)
+            out[position * size:(position + len(chunk)) * size] = memoryview(chunk).cast('B')
+            position += len(chunk)
+        return
+
+    unsigned = np.dtype('<u%d' % size)
+    bias = np.array(1 << (8 * size - 1) if dtype.kind == 'i' else 0, dtype=unsigned)
+    buckets = [os.path.join(work_dir, '%d_%d_%d' % (shift, position, b)) for b in range(256)]
+    counts = np.zeros(256, dtype=np.int64)
+    files = [None] * 256
+    try:
+        for chunk in _read_key_chunks(path, count, dtype, chunk_keys):
+            digits = (((chunk.view(unsigned) ^ bias) >> np.array(shift, dtype=unsigned)) & 255).astype(np.uint8)
+            order = np.argsort(digits, kind='stable')
+            chunk_counts = np.bincount(digits, minlength=256)
+            ends = np.cumsum(chunk_counts)
+            chunk = chunk[order]
+            for b in np.nonzero(chunk_counts)[0]:
+                if files[b] is None:
+                    files[b] = open(buckets[b], 'wb')
+                files[b].write(memoryview(chunk[ends[b] - chunk_counts[b]:ends[b]]).cast('B'))
+            counts += chunk_counts
+    finally:
+        for f in files:
+            if f is not None:
+                f.close()
+
+    for b in range(256):
+        if counts[b] > 0:
+            _external_sort_range(buckets[b], int(counts[b]), dtype, out, position, shift - 8, chunk_keys, work_dir)
+            position += int(counts[b])
+            os.remove(buckets[b])
+
+
 def time_radix_sort():
     '''
     This function is used to time radix sort on a wide range of bases using random input data.
@@ -104,101 +674,236 @@ def time_radix_sort():
     return results
 
 
+def time_parallel_radix_sort(n=1000000, workers=None):
+    '''
+    This function is used to time parallel_radix_sort with 1 up to workers processes on random 64-bit keys.
+    :param n: The number of keys
+    :param workers: The largest number of workers, by default the number of cpus
+    :return results: a list of tuples representing the number of workers and the time recorded for it.
+    '''
+    if workers is None:
+        workers = os.cpu_count() or 1
+    test_data = np.random.default_rng(n).integers(0, (2 ** 64) - 1, n, dtype=np.uint64, endpoint=True)
+    results = []
+    count = 1
+    while True:
+        start_time = timeit.default_timer()
+        parallel_radix_sort(test_data, count)
+        results.append((count, timeit.default_timer() - start_time))
+        if count >= workers:
+            break
+        count = min(count * 2, workers)
+    return results
+
+
+@instrumentation.timed('msd_radix_argsort')
+def msd_radix_argsort(keys, insertion_threshold=16):
+    '''
+    This is an MSD implementation of radix sort over byte strings. The indices of the keys are split into 256
+    buckets by their byte at the current depth, with keys that end before that depth placed first, and only the
+    buckets holding more than one key are split again at the next depth. Buckets of at most insertion_threshold
+    keys are finished with insertion sort. Ranges are kept on an explicit stack so deep common prefixes do not
+    recurse.
+    Complexity: O(D + Nlog(N)) where D is the total length of the distinguishing prefixes of the keys, the prefix
+    each key needs to tell it apart from the others, and N is the number of keys
+    :param keys: A list of bytes
+    :param insertion_threshold: The largest bucket finished with insertion sort
+    :return: an array of indices such that [keys[i] for i in result] is sorted and equal keys keep their order
+    '''
+    order = array('i', range(len(keys)))
+    temp = array('i', order)
+    stack = [(0, len(keys), 0)]
+    while len(stack) > 0:
+        lo, hi, depth = stack.pop()
+        if hi - lo <= insertion_threshold:
+            # the keys in the range share their first depth bytes so comparing them whole is enough
+            for i in range(lo + 1, hi):
+                current = order[i]
+                key = keys[current]
+                j = i - 1
+                while j >= lo and keys[order[j]] > key:
+                    order[j + 1] = order[j]
+                    j -= 1
+                order[j + 1] = current
+            continue
+
+        # bucket 0 holds the keys which end at this depth, bucket c + 1 the keys with byte c at this depth
+        countElements = [0] * 257
+        digits = []
+        for i in range(lo, hi):
+            key = keys[order[i]]
+            digit = key[depth] + 1 if depth < len(key) else 0
+            digits.append(digit)
+            countElements[digit] += 1
+        position = [lo] * 257
+        for c in range(1, 257):
+            position[c] = position[c - 1] + countElements[c - 1]
+        starts = list(position)
+        for i in range(lo, hi):
+            digit = digits[i - lo]
+            temp[position[digit]] = order[i]
+            position[digit] += 1
+        order[lo:hi] = temp[lo:hi]
+
+        # keys that ended are equal, every other bucket with more than one key is split at the next byte
+        for c in range(1, 257):
+            if countElements[c] > 1:
+                stack.append((starts[c], starts[c] + countElements[c], depth + 1))
+    return order
+
+
 def radix_sort_rotations(list):
     '''
-    This is an adaptation of radix sort which uses the counting_sort_partial adaptation to sort elements by the nth
-    character by its ascii value.
-    Complexity: O(NM) where n is the total number of strings in the input and M is the number of
-    characters in the longest string.
+    This function sorts a list of strings, or of bytes, using the msd_radix_argsort engine. Strings are compared by
+    their UTF-8 encoding, which orders them by code point.
+    Complexity: O(D + Nlog(N)) where D is the total length of the distinguishing prefixes of the strings and N is
+    the number of strings in the input
     :param list: A list of strings to be sorted
     :return: a sorted list of strings
     '''
     if len(list) == 0:
         return list
 
-    output = [0]*len(list)
-    temp = [0]*len(list)
-    max_number_length = len(max(list))
-    list_copy = []
-
-    for item in list:
-        list_copy.append(item)
-
-    for d in range(0, max_number_length):
+    keys = [item.encode('utf-8') if isinstance(item, str) else bytes(item) for item in list]
+    return [list[i] for i in msd_radix_argsort(keys)]
 
-        # copying the dth character in the string to the temp array
-
-        for x in range(len(list_copy)):
-            # if d is less than the current string length
-            if d < len(list_copy[x]):
-                # add the character to the temp array
-                temp[x] = list_copy[x][d]
-            else:
-                # add a character with an ascii value less than 'a'
-                temp[x] = '.'
-
-        # use list comprehension to convert all characters to the ascii value
-        temp = [ord(i) for i in temp]
-
-        # perform counting sort on the ascii values
-        position = counting_sort_partial(temp)
-
-        # move each element in the output array depending on the value in position
-        for i in range(len(temp)):
-            output[position[temp[i]]] = list_copy[i]
-            position[temp[i]] += 1
-
-        # copy the output array into the list_copy array to repeat the process for other characters
-        for i in range(len(output)):
-            list_copy[i] = output[i]
 
-    return output
+def least_rotation(string):
+    '''
+    This function is an implementation of Booth's algorithm which finds the rotation of a string that is smallest
+    lexicographically.
+    Complexity: O(M) where M is the length of the string
+    :param string: A string
+    :return: The index k such that string[k:] + string[:k] is the least rotation of string
+    '''
+    doubled = string + string
+    failure = [-1] * len(doubled)
+    k = 0
+    for j in range(1, len(doubled)):
+        c = doubled[j]
+        i = failure[j - k - 1]
+        while i != -1 and c != doubled[k + i + 1]:
+            if c < doubled[k + i + 1]:
+                k = j - i - 1
+            i = failure[i]
+        if c != doubled[k + i + 1]:
+            if c < doubled[k]:
+                k = j
+            failure[j - k] = -1
+        else:
+            failure[j - k] = i + 1
+    return k
+
+
+def smallest_period(string):
+    '''
+    This function returns the smallest p such that rotating string by p gives string back
+    Complexity: O(M) where M is the length of the string
+    :param string: A string
+    :return: The smallest period of the string as a rotation, 1 for the empty string
+    '''
+    if len(string) == 0:
+        return 1
+    # the prefix function of the string gives its longest border
+    border = [0] * len(string)
+    for i in range(1, len(string)):
+        j = border[i - 1]
+        while j > 0 and string[i] != string[j]:
+            j = border[j - 1]
+        if string[i] == string[j]:
+            j += 1
+        border[i] = j
+    period = len(string) - border[-1]
+    return period if len(string) % period == 0 else len(string)
+
+
+class RotationIndex:
+    '''
+    This class indexes a corpus of strings by their canonical rotation, the least rotation found by Booth's
+    algorithm. Every string is stored as its canonical rotation and the offset it is rotated from it by, and each
+    canonical rotation keeps the set of offsets present in the corpus. The p rotation of a string is in the corpus
+    exactly when its offset plus p, modulo the period of the canonical rotation, is in that set, so a query needs
+    no sort and no rotated copies.
+    '''
+    def __init__(self, strings):
+        '''
+        Constructor
+        Complexity: O(T) where T is the total length of the strings
+        :param strings: An iterable of strings, which may be a stream such as the lines of a file
+        '''
+        self.strings = []
+        self.entries = []
+        self.classes = {}
+        self.results = {}
+        for string in strings:
+            canonical, offset = self._canonical(string)
+            period, offsets = self.classes.setdefault(canonical, (smallest_period(canonical), set()))
+            offsets.add(offset % period)
+            self.strings.append(string)
+            self.entries.append((canonical, offset))
+
+    def _canonical(self, string):
+        '''
+        Returns the least rotation of string and the offset such that string is that rotation rotated by offset
+        '''
+        k = least_rotation(string)
+        canonical = string[k:] + string[:k]
+        return canonical, (-k) % len(string) if len(string) > 0 else 0
+
+    def contains_rotation(self, string, p):
+        '''
+        This function checks if the p rotation of string is in the corpus
+        Complexity: O(M) where M is the length of the string
+        :param string: A string
+        :param p: A number representing the number of rotations
+        :return: Boolean value representing the rotation being in the corpus or not
+        '''
+        canonical, offset = self._canonical(string)
+        if canonical not in self.classes:
+            return False
+        period, offsets = self.classes[canonical]
+        return (offset + p) % period in offsets
+
+    def query(self, p):
+        '''
+        This function returns the strings of the corpus whose p rotation is also in the corpus. The answers are kept
+        so repeating a query is free
+        Complexity: O(N) where N is the number of strings in the corpus
+        :param p: A number representing the number of rotations
+        :return: The strings in the corpus, in corpus order, whose p rotations also exist
+        '''
+        if p not in self.results:
+            classes = self.classes
+            output = []
+            for string, (canonical, offset) in zip(self.strings, self.entries):
+                period, offsets = classes[canonical]
+                if (offset + p) % period in offsets:
+                    output.append(string)
+            self.results[p] = output
+        return self.results[p]
+
+    def query_stream(self, strings, p):
+        '''
+        This function yields the strings of a stream whose p rotation is in the corpus
+        Complexity: O(T) where T is the total length of the streamed strings
+        :param strings: An iterable of strings, which may be a stream such as the lines of a file
+        :param p: A number representing the number of rotations
+        :return: A generator of the matching strings
+        '''
+        for string in strings:
+            if self.contains_rotation(string, p):
+                yield string
 
 
 def find_rotations(list, p):
     '''
     This function takes a list of strings and a number p and returns all occurrences of the p rotation of each
-    string in the original list and returns them
-    Complexity: O(NM) Where N is the number of strings in the input list and M is the number of characters in the
-    longest string
-    :param list: A list of strings
+    string in the original list and returns them. A rotation by p moves the first p characters to the end and a
+    negative p rotates the other way. The work is done by a RotationIndex, build one directly to answer many p
+    queries against the same list.
+    Complexity: O(T) Where T is the total number of characters in the list
+    :param list: A list of strings, or any iterable of strings
     :param p: A number representing the number of rotations
-    :return: The strings in the original list whose p rotations also exist
-    '''
-    # an array to hold the rotated strings
-    rotated = []
-    # for each string in the list
-    for string in list:
-        # if the rotation is positive
-        if p > 0:
-            # find the number of rotations for the current string
-            num_rotations = p % len(string)
-            # append the rotated string to rotated
-            rotated.append(string[num_rotations:] + string[0:num_rotations])
-        # if the rotation is negative
-        elif p < 0:
-            # find the number of rotations for the current string
-            num_rotations = (p*-1) % len(string)
-            # rotate the strings and append to rotated
-            rotated.append(string[len(string) - num_rotations:] + string[0: len(string) - num_rotations])
-
-    # use radix sort to sort a list containing the rotated and unrotated strings in O(MN)
-    final = radix_sort_rotations(rotated + list)
-    output = []
-
-    # Strings that are the same will be positioned next to each other after sorting.
-    # check if the i-1 string is the same as the ith string. if so append to output
-    for i in range(1, len(final)):
-        if final[i-1] == final[i]:
-            output.append(final[i])
-
-    # return the strings to the original form found in the input list
-    if p > 0:
-        output = [string[len(string) - num_rotations:] + string[0: len(string) - num_rotations] for string in output]
-    elif p < 0:
-        output = [string[num_rotations:] + string[0:num_rotations] for string in output]
-
-    return output
-
-
-time_radix_sort()
\ No newline at end of file
+    :return: The strings in the original list whose p rotations also exist, in the order of the list
+    '''
+    return RotationIndex(list).query(p)
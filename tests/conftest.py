@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+# the modules under test are loaded from their files by benchmark.load_module as their names are not importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import benchmark
+
+
+@pytest.fixture(scope='session')
+def graph_module():
+    return benchmark.load_module('graph')
+
+
+@pytest.fixture(scope='session')
+def dynamic_module():
+    return benchmark.load_module('dynamic')
+
+
+@pytest.fixture(scope='session')
+def radix_module():
+    return benchmark.load_module('radix_sort')
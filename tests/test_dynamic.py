@@ -0,0 +1,91 @@
+import random
+
+import pytest
+
+
+def check_walk(M, result):
+    '''
+    A walk is a list of cells one move apart whose values increase
+    '''
+    length, path = result
+    assert len(path) == length
+    for (a, b), (c, d) in zip(path, path[1:]):
+        assert max(abs(a - c), abs(b - d)) == 1
+        assert M[c][d] > M[a][b]
+
+
+def reference_longest_walk(dynamic_module, M):
+    memo = [[0 for _ in range(len(M))] for _ in range(len(M[0]))]
+    return max(dynamic_module.longest_walk_aux(x, y, M, memo) for x in range(len(M)) for y in range(len(M[0])))
+
+
+def random_matrix(rng, m, n):
+    top = rng.randint(1, 50)
+    return [[rng.randint(0, top) for _ in range(n)] for _ in range(m)]
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_longest_walk(dynamic_module, seed):
+    rng = random.Random(seed)
+    M = random_matrix(rng, rng.randint(1, 25), rng.randint(1, 25))
+    result = dynamic_module.longest_walk(M)
+    check_walk(M, result)
+    assert result[0] == reference_longest_walk(dynamic_module, M)
+
+
+def test_longest_walk_without_numpy(dynamic_module, monkeypatch):
+    rng = random.Random(0)
+    M = random_matrix(rng, 20, 20)
+    expected = dynamic_module.longest_walk(M)[0]
+    monkeypatch.setattr(dynamic_module, 'np', None)
+    result = dynamic_module.longest_walk(M)
+    check_walk(M, result)
+    assert result[0] == expected
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_longest_walk_tiled(dynamic_module, tmp_path, seed):
+    np = pytest.importorskip('numpy')
+    rng = random.Random(seed)
+    M = random_matrix(rng, rng.randint(1, 30), rng.randint(1, 30))
+    result = dynamic_module.longest_walk_tiled(np.array(M), rng.randint(1, 8))
+    check_walk(M, result)
+    assert result[0] == dynamic_module.longest_walk(M)[0]
+
+
+def test_longest_walk_tiled_snake(dynamic_module, tmp_path):
+    np = pytest.importorskip('numpy')
+    # one increasing path through every cell, crossing the blocks many times
+    snake = np.arange(60 * 60).reshape(60, 60)
+    snake[1::2] = snake[1::2, ::-1]
+    matrix_file = str(tmp_path / 'snake.npy')
+    np.save(matrix_file, snake)
+    result = dynamic_module.longest_walk_tiled(matrix_file, 16, str(tmp_path / 'memo'))
+    assert result == dynamic_module.longest_walk(snake)
+    assert result[0] == 60 * 60
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_longest_walk_index(dynamic_module, seed):
+    rng = random.Random(seed)
+    m, n = rng.randint(1, 15), rng.randint(1, 15)
+    M = random_matrix(rng, m, n)
+    index = dynamic_module.LongestWalkIndex(M)
+    for _ in range(30):
+        x, y = rng.randrange(m), rng.randrange(n)
+        M[x][y] = rng.randint(0, 60)
+        index.update(x, y, M[x][y])
+        assert index.length() == reference_longest_walk(dynamic_module, M)
+        check_walk(M, index.longest_path())
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_longest_oscillation(dynamic_module, seed):
+    rng = random.Random(seed)
+    values = [rng.randint(0, 5) for _ in range(rng.randint(1, 40))]
+    length, indexes = dynamic_module.longest_oscillation(values)
+    assert len(indexes) == length
+    steps = [values[j] - values[i] for i, j in zip(indexes, indexes[1:])]
+    assert all(step != 0 for step in steps)
+    assert all((a > 0) != (b > 0) for a, b in zip(steps, steps[1:]))
+    assert list(dynamic_module.longest_oscillation_stream(values))[-1] == length
@@ -0,0 +1,297 @@
+import collections
+import heapq
+import math
+import multiprocessing
+import os
+import random
+
+import pytest
+
+import benchmark
+
+
+def write_graph(tmp_path, num_nodes, edges):
+    '''
+    Writes a graph file of the given (u, v, w) edges and returns its name
+    '''
+    gfile = str(tmp_path / 'graph.txt')
+    with open(gfile, 'w') as f:
+        f.write('%d\n' % num_nodes)
+        for u, v, w in edges:
+            f.write('%d %d %d\n' % (u, v, w))
+    return gfile
+
+
+def random_edges(rng, num_nodes, num_edges, max_weight=50):
+    '''
+    Random edges which may repeat, loop and leave the graph disconnected
+    '''
+    return [(rng.randrange(num_nodes), rng.randrange(num_nodes), rng.randint(1, max_weight))
+            for _ in range(num_edges)]
+
+
+def live_edges(graph):
+    return list(zip(graph.edgeU, graph.edgeV, graph.edgeW))
+
+
+def reference_mst(edges, num_nodes):
+    '''
+    Kruskal over the edges sorted by (weight, id), the tie rule every method of the graph follows
+    '''
+    parent = list(range(num_nodes))
+
+    def find(x):
+        while parent[x] != x:
+            x = parent[x]
+        return x
+
+    tree = []
+    for e in sorted(range(len(edges)), key=lambda e: (edges[e][2], e)):
+        u, v, w = edges[e]
+        ru, rv = find(u), find(v)
+        if ru != rv:
+            parent[ru] = rv
+            tree.append((u, v, w))
+    return tree
+
+
+def reference_dijkstra(edges, num_nodes, source):
+    adjacency = [[] for _ in range(num_nodes)]
+    for u, v, w in edges:
+        adjacency[u].append((v, w))
+        adjacency[v].append((u, w))
+    dist = [math.inf] * num_nodes
+    dist[source] = 0
+    heap = [(0, source)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        for v, w in adjacency[u]:
+            if d + w < dist[v]:
+                dist[v] = d + w
+                heapq.heappush(heap, (d + w, v))
+    return dist
+
+
+def reference_eccentricities(edges, num_nodes):
+    adjacency = [[] for _ in range(num_nodes)]
+    for u, v, w in edges:
+        adjacency[u].append(v)
+        adjacency[v].append(u)
+    eccentricities = []
+    for source in range(num_nodes):
+        dist = {source: 0}
+        queue = collections.deque([source])
+        while queue:
+            u = queue.popleft()
+            for v in adjacency[u]:
+                if v not in dist:
+                    dist[v] = dist[u] + 1
+                    queue.append(v)
+        eccentricities.append(max(dist.values()) if len(dist) == num_nodes else math.inf)
+    return eccentricities
+
+
+def check_rows(graph, edges):
+    '''
+    Every row of the compressed sparse row arrays holds the edges of its vertex, besides the free slots of weight 0
+    '''
+    expected = [collections.Counter() for _ in range(graph.num_nodes)]
+    for u, v, w in edges:
+        expected[u][(v, w)] += 1
+        expected[v][(u, w)] += 1
+    offsets, neighbours, weights = graph.offsets, graph.neighbours, graph.weights
+    for u in range(graph.num_nodes):
+        row = collections.Counter((neighbours[i], weights[i]) for i in range(offsets[u], offsets[u + 1])
+                                  if weights[i] != 0)
+        assert row == expected[u]
+        assert all(neighbours[i] == u for i in range(offsets[u], offsets[u + 1]) if weights[i] == 0)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_updates_match_a_fresh_graph(graph_module, tmp_path, seed):
+    rng = random.Random(seed)
+    num_nodes = rng.randint(2, 30)
+    gfile = write_graph(tmp_path, num_nodes, random_edges(rng, num_nodes, rng.randint(0, 3 * num_nodes)))
+    graph = graph_module.Graph(gfile, cache=seed % 2 == 0)
+    if seed % 4 == 0:
+        # the arrays are copied out of the memory mapped cache by the first update
+        graph = graph_module.Graph(gfile, cache=True)
+        assert graph.cacheMap is not None
+    for step in range(80):
+        edges = live_edges(graph)
+        operation = rng.random()
+        if operation < 0.4 or len(edges) == 0:
+            graph.add_edge(rng.randrange(num_nodes), rng.randrange(num_nodes), rng.randint(1, 50))
+        elif operation < 0.7:
+            u, v, w = rng.choice(edges)
+            graph.remove_edge(u, v)
+        else:
+            u, v, w = rng.choice(edges)
+            graph.update_weight(u, v, rng.randint(1, 50))
+        if step % 5 == 0 or step == 79:
+            edges = live_edges(graph)
+            assert list(graph.edgeOrder) == sorted(range(len(edges)), key=lambda e: (edges[e][2], e))
+            mstU, mstV, mstW, total = graph.minimum_spanning_tree()
+            assert list(zip(mstU, mstV, mstW)) == reference_mst(edges, num_nodes)
+            check_rows(graph, edges)
+            source = rng.randrange(num_nodes)
+            assert graph.dijkstra(source)[0] == reference_dijkstra(edges, num_nodes, source)
+
+
+def test_update_errors(graph_module, tmp_path):
+    graph = graph_module.Graph(write_graph(tmp_path, 3, [(0, 1, 5)]))
+    with pytest.raises(ValueError):
+        graph.remove_edge(1, 2)
+    with pytest.raises(ValueError):
+        graph.update_weight(0, 3, 1)
+    with pytest.raises(ValueError):
+        graph.add_edge(0, 5, 1)
+
+
+def test_full_rows_are_rebuilt(graph_module, tmp_path):
+    graph = graph_module.Graph(write_graph(tmp_path, 4, [(0, 1, 1), (1, 2, 1), (2, 3, 1)]))
+    edges = live_edges(graph)
+    for w in range(2, 40):
+        graph.add_edge(0, 3, w)
+        edges.append((0, 3, w))
+        check_rows(graph, edges)
+    assert graph.dijkstra(0)[0] == [0, 1, 2, 2]
+
+
+@pytest.mark.parametrize('method', ['kruskal', 'filter', 'boruvka'])
+@pytest.mark.parametrize('seed', range(5))
+def test_minimum_spanning_tree_methods(graph_module, tmp_path, method, seed):
+    rng = random.Random(seed)
+    num_nodes = rng.randint(1, 200)
+    edges = random_edges(rng, num_nodes, rng.randint(0, 4 * num_nodes), max_weight=rng.choice([3, 1000]))
+    graph = graph_module.Graph(write_graph(tmp_path, num_nodes, edges))
+    mstU, mstV, mstW, total = graph.minimum_spanning_tree(method)
+    # boruvka finds the same tree in another order
+    assert sorted(zip(mstU, mstV, mstW)) == sorted(reference_mst(edges, num_nodes))
+    assert total == sum(mstW)
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_graph_center(graph_module, tmp_path, seed):
+    rng = random.Random(seed)
+    num_nodes = rng.randint(1, 60)
+    edges = [(rng.randrange(v), v, 1) for v in range(1, num_nodes)]
+    edges += random_edges(rng, num_nodes, rng.randint(0, num_nodes))
+    if seed % 10 == 9 and num_nodes > 1:
+        # cut a vertex off so there is no spanning tree
+        edges = [(u, v, w) for u, v, w in edges if num_nodes - 1 not in (u, v)]
+    graph = graph_module.Graph(write_graph(tmp_path, num_nodes, edges))
+    eccentricities = reference_eccentricities(edges, num_nodes)
+    best = min(eccentricities)
+    if best == math.inf:
+        assert graph.shallowest_spanning_tree() == (0, math.inf)
+    else:
+        assert graph.shallowest_spanning_tree() == (eccentricities.index(best), best)
+
+
+@pytest.mark.parametrize('landmarks', [0, 4])
+def test_shortest_path_matches_dijkstra(graph_module, tmp_path, landmarks):
+    rng = random.Random(landmarks)
+    num_nodes = 300
+    edges = random_edges(rng, num_nodes, 500, max_weight=100)
+    graph = graph_module.Graph(write_graph(tmp_path, num_nodes, edges))
+    if landmarks:
+        graph.build_landmarks(landmarks)
+    for _ in range(200):
+        source, target = rng.randrange(num_nodes), rng.randrange(num_nodes)
+        dist = graph.dijkstra(source)[0]
+        distance, path = graph.shortest_path(source, target)
+        assert distance == dist[target]
+        if distance < math.inf:
+            assert path[0] == source and path[-1] == target
+            weight = {}
+            for u, v, w in edges:
+                weight[(u, v)] = weight[(v, u)] = min(w, weight.get((u, v), math.inf))
+            assert sum(weight[step] for step in zip(path, path[1:])) == distance
+        else:
+            assert path == []
+
+
+def test_landmarks_round_trip(graph_module, tmp_path):
+    rng = random.Random(1)
+    edges = random_edges(rng, 100, 300)
+    graph = graph_module.Graph(write_graph(tmp_path, 100, edges))
+    graph.build_landmarks(4)
+    landmark_file = str(tmp_path / 'landmarks')
+    graph.save_landmarks(landmark_file)
+    loaded = graph_module.Graph(write_graph(tmp_path, 100, edges))
+    assert list(loaded.load_landmarks(landmark_file)) == list(graph.landmarks)
+    for source, target in [(rng.randrange(100), rng.randrange(100)) for _ in range(50)]:
+        assert loaded.shortest_path(source, target)[0] == graph.dijkstra(source)[0][target]
+
+    # the same vertices and edges with other weights
+    reweighted = graph_module.Graph(write_graph(tmp_path, 100, [(u, v, w + 1) for u, v, w in edges]))
+    with pytest.raises(ValueError):
+        reweighted.load_landmarks(landmark_file)
+
+
+def test_distance_matrix_matches_dijkstra(graph_module, tmp_path):
+    rng = random.Random(2)
+    num_nodes = 200
+    edges = random_edges(rng, num_nodes, 300)
+    graph = graph_module.Graph(write_graph(tmp_path, num_nodes, edges))
+    sources = [rng.randrange(num_nodes) for _ in range(10)]
+    targets = [rng.randrange(num_nodes) for _ in range(15)]
+    expected = [[graph.dijkstra(s)[0][t] for t in targets] for s in sources]
+    assert graph.distance_matrix(sources, targets) == expected
+    # the second call is answered from the path cache
+    hits = graph.pathCache.hits
+    assert graph.distance_matrix(sources, targets) == expected
+    assert graph.pathCache.hits > hits
+    graph.add_edge(sources[0], targets[0], 1)
+    assert len(graph.pathCache) == 0
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != 'fork',
+                    reason='worker processes can only import the modules loaded from files when they are forked')
+def test_pools_match_serial(graph_module, tmp_path):
+    pytest.importorskip('numpy')
+    rng = random.Random(3)
+    gfile = benchmark.random_graph_file(rng, 400)
+    try:
+        graph = graph_module.Graph(gfile)
+        sources = list(range(0, 400, 37))
+        assert graph.distance_matrix(sources, range(400), workers=2) == \
+            [graph.dijkstra(s)[0] for s in sources]
+        assert graph.shallowest_spanning_tree(workers=2) == graph.shallowest_spanning_tree()
+        assert graph.minimum_spanning_tree('boruvka', workers=2)[3] == graph.minimum_spanning_tree()[3]
+    finally:
+        os.remove(gfile)
+
+
+def test_shortest_errand(graph_module, tmp_path):
+    rng = random.Random(4)
+    num_nodes = 80
+    edges = [(rng.randrange(v), v, rng.randint(1, 20)) for v in range(1, num_nodes)]
+    edges += random_edges(rng, num_nodes, 100, max_weight=20)
+    graph = graph_module.Graph(write_graph(tmp_path, num_nodes, edges))
+    dist = [reference_dijkstra(edges, num_nodes, v) for v in range(num_nodes)]
+    for _ in range(20):
+        home, destination = rng.randrange(num_nodes), rng.randrange(num_nodes)
+        ice = rng.sample(range(num_nodes), 3)
+        cream = rng.sample(range(num_nodes), 3)
+        expected = min(dist[home][a] + dist[a][b] + dist[b][destination] for a in ice for b in cream)
+        distance, path = graph.shortest_errand(home, destination, ice, cream)
+        assert distance == expected
+        assert path[0] == home and path[-1] == destination
+
+
+def test_cache_is_reused_and_rejected_when_stale(graph_module, tmp_path):
+    rng = random.Random(5)
+    edges = random_edges(rng, 50, 120)
+    gfile = write_graph(tmp_path, 50, edges)
+    built = graph_module.Graph(gfile, cache=True)
+    mapped = graph_module.Graph(gfile, cache=True)
+    assert mapped.cacheMap is not None
+    for name, typecode in graph_module.GRAPH_CACHE_ARRAYS:
+        assert list(getattr(mapped, name)) == list(getattr(built, name))
+    with open(gfile, 'a') as f:
+        f.write('0 1 1\n')
+    assert graph_module.load_graph_cache(gfile + '.gcache', gfile) is None
@@ -0,0 +1,91 @@
+import multiprocessing
+import random
+from array import array
+
+import pytest
+
+
+@pytest.mark.parametrize('base', [2, 10, 256, 1 << 16, 1 << 20, 'auto'])
+def test_radix_sort_list(radix_module, base):
+    rng = random.Random(0)
+    keys = [rng.randrange(2 ** 64) for _ in range(500)] + [0, 0, 1]
+    assert radix_module.radix_sort(list(keys), base) == sorted(keys)
+
+
+@pytest.mark.parametrize('base', [10, 256, 1 << 20])
+def test_radix_sort_keeps_the_buffer_type(radix_module, base):
+    np = pytest.importorskip('numpy')
+    rng = random.Random(1)
+    keys = [rng.randrange(2 ** 40) for _ in range(300)]
+    for buffer in (array('Q', keys), np.array(keys, dtype=np.uint64)):
+        result = radix_module.radix_sort(buffer, base)
+        assert type(result) is type(buffer)
+        assert list(result) == sorted(keys)
+
+
+@pytest.mark.parametrize('dtype', ['uint8', 'int16', 'int32', 'uint64', 'int64'])
+def test_radix_sort_array(radix_module, dtype):
+    np = pytest.importorskip('numpy')
+    info = np.iinfo(dtype)
+    keys = np.random.default_rng(2).integers(info.min, info.max, 2000, dtype=dtype, endpoint=True)
+    for base in (2, 256, 1 << 16):
+        assert (radix_module.radix_sort_array(keys, base) == np.sort(keys)).all()
+
+
+def test_radix_argsort_and_sort_by_key(radix_module):
+    rng = random.Random(3)
+    records = [(rng.randint(-50, 50), rng.randint(0, 3)) for _ in range(300)]
+    order = radix_module.radix_argsort([r[0] for r in records], 16)
+    assert [records[i] for i in order] == sorted(records, key=lambda r: r[0])
+    assert radix_module.sort_by_key(records, [lambda r: r[1], lambda r: r[0]]) == \
+        sorted(records, key=lambda r: (r[1], r[0]))
+
+
+def test_choose_radix_base_avoids_sparse_tables(radix_module):
+    rng = random.Random(4)
+    keys = [rng.randrange(2 ** 64) for _ in range(100000)]
+    base = radix_module.choose_radix_base(keys, radix_module.DEFAULT_RADIX_PROFILE)
+    assert base <= radix_module.SPARSE_COUNTING_FACTOR * len(keys)
+
+
+def test_load_radix_profile_reads_each_file(radix_module, tmp_path, monkeypatch):
+    # calibrating replaces the profile of the module, which is put back afterwards
+    monkeypatch.setattr(radix_module, '_radix_profile', None)
+    profile_file = str(tmp_path / 'profile.json')
+    assert radix_module.load_radix_profile(profile_file) == radix_module.DEFAULT_RADIX_PROFILE
+    profile = radix_module.calibrate_radix_sort(profile_file, n=1000)
+    assert radix_module.load_radix_profile(profile_file) == profile
+
+
+@pytest.mark.parametrize('dtype', ['<u1', '<i2', '<i4', '<u8', '<i8'])
+def test_external_radix_sort(radix_module, tmp_path, dtype):
+    np = pytest.importorskip('numpy')
+    dtype = np.dtype(dtype)
+    info = np.iinfo(dtype)
+    keys = np.random.default_rng(5).integers(info.min, info.max, 20000, dtype=dtype.newbyteorder('='),
+                                             endpoint=True).astype(dtype)
+    # a run of one key which no byte can split
+    keys[:5000] = keys[0]
+    in_file, out_file = str(tmp_path / 'in'), str(tmp_path / 'out')
+    keys.tofile(in_file)
+    count = radix_module.external_radix_sort(in_file, out_file, dtype.itemsize, dtype.kind == 'i',
+                                             memory_limit=20 * (4 * dtype.itemsize + 24) * 50,
+                                             temp_dir=str(tmp_path))
+    assert count == len(keys)
+    assert (np.fromfile(out_file, dtype=dtype) == np.sort(keys)).all()
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != 'fork',
+                    reason='worker processes can only import the modules loaded from files when they are forked')
+def test_parallel_radix_sort(radix_module):
+    np = pytest.importorskip('numpy')
+    keys = np.random.default_rng(6).integers(-2 ** 62, 2 ** 62, 50000, dtype=np.int64)
+    assert (radix_module.parallel_radix_sort(keys, workers=2) == np.sort(keys)).all()
+
+
+def test_rotations(radix_module):
+    rng = random.Random(7)
+    for _ in range(50):
+        s = ''.join(rng.choice('ab') for _ in range(rng.randint(1, 8)))
+        k = radix_module.least_rotation(s)
+        assert s[k:] + s[:k] == min(s[i:] + s[:i] for i in range(len(s)))